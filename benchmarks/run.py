@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Benchmarks of pyliquidplanner against a local stand-in for the LiquidPlanner
+API (see server.py), so the numbers don't depend on the network or on
+LiquidPlanner's own response times.
+
+Run from the root of the project:
+
+    $ python benchmarks/run.py
+    $ python benchmarks/run.py --tasks 10000 --output before.json
+    $ python benchmarks/run.py --tasks 10000 --baseline before.json
+
+With --baseline, exits with status 1 if any benchmark's median time is
+more than --threshold times the baseline's.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from liquidplanner import LiquidPlanner, codec
+from liquidplanner.auth import BasicCredentials
+from liquidplanner.models import convert_dates
+
+from server import FakeLiquidPlanner, WORKSPACE_ID, generate_workspace
+
+
+# Entity types fetched with all()
+LIST_TYPES = ('treeitems', 'tasks', 'comments', 'timesheet_entries')
+
+
+def measure(func, repeat, setup=None):
+    """Seconds taken by each of repeat calls of func, after one warm up call.
+
+    :param setup: called before each call, outside the timing, and its
+        result passed to func"""
+    times = []
+    for i in range(repeat + 1):
+        arg = setup() if setup is not None else None
+        start = timeit.default_timer()
+        func(arg)
+        times.append(timeit.default_timer() - start)
+    return times[1:]
+
+
+def summarize(times, records):
+    times = sorted(times)
+    median = times[len(times) // 2]
+    return {
+        'records': records,
+        'calls': len(times),
+        'min': times[0],
+        'median': median,
+        'p95': times[min(len(times) - 1, int(len(times) * 0.95))],
+        'mean': sum(times) / len(times),
+        'records_per_second': records / median if median else None,
+    }
+
+
+def run(lp, data, repeat):
+    """Run every benchmark, returning a dict of name to summary"""
+    results = {}
+
+    # End to end: request, download, decode, convert dates and wrap
+    for name in LIST_TYPES:
+        manager = getattr(lp, name)
+        times = measure(lambda arg: manager.all(), repeat)
+        results['all ' + name] = summarize(times, len(data[name]))
+
+    ids = [task['id'] for task in data['tasks']]
+    ids = itertools.cycle(ids)
+    times = measure(lambda arg: lp.tasks.get(arg), repeat * 20,
+            setup=lambda: next(ids))
+    results['get tasks'] = summarize(times, 1)
+
+    # The steps after the response has been downloaded
+    manager = lp.tasks
+    url = manager._format_url(manager.url)
+    response = manager._send('get', url)
+    manager._check_response(response)
+    text = response.text
+
+    times = measure(lambda arg: manager._parse_api_response(response, url),
+            repeat)
+    results['_parse_api_response tasks'] = summarize(times, len(data['tasks']))
+
+    times = measure(lambda arg: manager._parse_data(arg, url), repeat,
+            setup=lambda: json.loads(text))
+    results['Model tasks'] = summarize(times, len(data['tasks']))
+
+    def convert(records, keys=None):
+        for record in records:
+            convert_dates(record, keys)
+
+    records = json.loads(text)
+    times = measure(convert, repeat, setup=lambda: copy.deepcopy(records))
+    results['convert_dates tasks'] = summarize(times, len(data['tasks']))
+
+    times = measure(lambda arg: convert(arg, LiquidPlanner.DATE_KEYS),
+            repeat, setup=lambda: copy.deepcopy(records))
+    results['convert_dates tasks (DATE_KEYS)'] = summarize(times,
+            len(data['tasks']))
+
+    return results
+
+
+def report(results, baseline=None, threshold=1.2):
+    """Print a table of results, returning the names of any that are
+    slower than the baseline by more than threshold"""
+    print('{0:<36} {1:>8} {2:>10} {3:>10} {4:>12} {5:>8}'.format(
+        'benchmark', 'records', 'median ms', 'p95 ms', 'records/s',
+        'change' if baseline else ''))
+
+    regressions = []
+    for name in sorted(results):
+        result = results[name]
+
+        change = ''
+        if baseline and name in baseline:
+            ratio = result['median'] / baseline[name]['median']
+            change = '{0:.2f}x'.format(ratio)
+            if ratio > threshold:
+                regressions.append(name)
+                change += ' !'
+
+        print('{0:<36} {1:>8} {2:>10.2f} {3:>10.2f} {4:>12.0f} {5:>8}'.format(
+            name, result['records'], result['median'] * 1000,
+            result['p95'] * 1000, result['records_per_second'] or 0, change))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Benchmark pyliquidplanner against a local server')
+    parser.add_argument('--projects', type=int, default=50)
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--comments', type=int, default=2000)
+    parser.add_argument('--timesheet-entries', type=int, default=5000)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0,
+            help='seed for the synthetic data')
+    parser.add_argument('--codec', choices=('json', 'fastest'), default='json',
+            help='JSON codec used by the client')
+    parser.add_argument('--repeat', type=int, default=10,
+            help='number of timed calls of each benchmark')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline',
+            help='compare with results written by --output')
+    parser.add_argument('--threshold', type=float, default=1.2,
+            help='slowdown compared with the baseline that fails the run')
+    args = parser.parse_args()
+
+    data = generate_workspace(projects=args.projects, tasks=args.tasks,
+            comments=args.comments, timesheet_entries=args.timesheet_entries,
+            members=args.members, seed=args.seed)
+
+    with FakeLiquidPlanner(data) as server:
+        lp = LiquidPlanner(BasicCredentials('benchmarks', 'benchmarks'),
+                workspace_id=WORKSPACE_ID, base_url=server.base_url,
+                codec=codec.fastest() if args.codec == 'fastest' else None)
+        results = run(lp, data, args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = report(results, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if regressions:
+        print('\nSlower than the baseline: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
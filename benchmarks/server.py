@@ -0,0 +1,232 @@
+"""A local stand-in for the LiquidPlanner API, serving a synthetic workspace.
+
+Only GET requests for the account, workspaces and the records of one
+workspace are supported, which is all the benchmarks need. Query
+parameters are ignored. Every response body is encoded up front, so the
+server adds as little as possible to the times being measured.
+"""
+
+import datetime
+import json
+import random
+import threading
+
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import urlparse
+
+
+WORKSPACE_ID = 1
+
+
+def generate_workspace(projects=50, tasks=2000, comments=2000,
+        timesheet_entries=5000, members=20, seed=0):
+    """Synthetic records for one workspace, as a dict of entity type (e.g.
+    'tasks') to a list of records. treeitems holds every project and task.
+
+    The same arguments always generate the same records."""
+    rand = random.Random(seed)
+    start = datetime.datetime(2016, 1, 4, 9, 0, 0)
+    ids = iter(range(1, 1000000000))
+
+    def timestamp():
+        moment = start + datetime.timedelta(minutes=rand.randint(0, 525600))
+        return moment.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+    def day():
+        date = start + datetime.timedelta(days=rand.randint(0, 365))
+        return date.strftime('%Y-%m-%d')
+
+    data = {}
+
+    data['members'] = [{
+        'id': next(ids),
+        'type': 'Member',
+        'user_name': 'member{0}'.format(i),
+        'first_name': 'Member',
+        'last_name': str(i),
+        'created_at': timestamp(),
+        'updated_at': timestamp(),
+    } for i in range(members)]
+    member_ids = [member['id'] for member in data['members']]
+
+    data['activities'] = [{
+        'id': next(ids),
+        'type': 'Activity',
+        'name': name,
+        'created_at': timestamp(),
+        'updated_at': timestamp(),
+    } for name in ('Development', 'Testing', 'Design', 'Support')]
+    activity_ids = [activity['id'] for activity in data['activities']]
+
+    data['projects'] = [{
+        'id': next(ids),
+        'type': 'Project',
+        'name': 'Project {0}'.format(i),
+        'parent_id': 0,
+        'owner_id': rand.choice(member_ids),
+        'is_done': rand.random() < 0.2,
+        'created_at': timestamp(),
+        'updated_at': timestamp(),
+        'expected_start': timestamp(),
+        'expected_finish': timestamp(),
+        'promise_by': day(),
+        'low_effort_remaining': 0.0,
+        'high_effort_remaining': 0.0,
+        'work': 0.0,
+    } for i in range(projects)]
+
+    data['tasks'] = []
+    for i in range(tasks):
+        project = rand.choice(data['projects'])
+        low = round(rand.uniform(0, 40), 2)
+        data['tasks'].append({
+            'id': next(ids),
+            'type': 'Task',
+            'name': 'Task {0}'.format(i),
+            'description': 'Synthetic task ' * rand.randint(0, 10),
+            'parent_id': project['id'],
+            'project_id': project['id'],
+            'owner_id': rand.choice(member_ids),
+            'is_done': rand.random() < 0.5,
+            'created_at': timestamp(),
+            'updated_at': timestamp(),
+            'expected_start': timestamp(),
+            'expected_finish': timestamp(),
+            'promise_by': day() if rand.random() < 0.3 else None,
+            'low_effort_remaining': low,
+            'high_effort_remaining': round(low * rand.uniform(1, 2), 2),
+            'work': round(rand.uniform(0, 40), 2),
+            'assignments': [{
+                'id': next(ids),
+                'person_id': rand.choice(member_ids),
+                'low_effort_remaining': low,
+                'updated_at': timestamp(),
+            }],
+        })
+
+    data['treeitems'] = data['projects'] + data['tasks']
+
+    data['comments'] = [{
+        'id': next(ids),
+        'type': 'Comment',
+        'item_id': rand.choice(data['tasks'])['id'],
+        'member_id': rand.choice(member_ids),
+        'comment': 'Synthetic comment ' * rand.randint(1, 20),
+        'created_at': timestamp(),
+        'updated_at': timestamp(),
+    } for i in range(comments)]
+
+    data['timesheet_entries'] = []
+    for i in range(timesheet_entries):
+        task = rand.choice(data['tasks'])
+        data['timesheet_entries'].append({
+            'id': next(ids),
+            'type': 'TimesheetEntry',
+            'member_id': rand.choice(member_ids),
+            'item_id': task['id'],
+            'project_id': task['project_id'],
+            'activity_id': rand.choice(activity_ids),
+            'work': round(rand.uniform(0.25, 8), 2),
+            'work_performed_on': day(),
+            'note': '',
+            'created_at': timestamp(),
+            'updated_at': timestamp(),
+        })
+
+    return data
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep connections alive, as LiquidPlanner does
+    protocol_version = 'HTTP/1.1'
+
+    # Otherwise the body waits for the client to acknowledge the headers,
+    # adding ~40ms to every response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        body = self.server.bodies.get(path)
+
+        if body is None:
+            self.respond(404, {'type': 'Error', 'error': 'NotFound',
+                    'message': 'No such record: {0}'.format(path)})
+        else:
+            self.respond(200, body)
+
+    def respond(self, status, body):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeLiquidPlanner(object):
+    """Serves a synthetic workspace from a background thread:
+
+        with FakeLiquidPlanner(generate_workspace()) as server:
+            lp = LiquidPlanner(credentials, base_url=server.base_url)
+    """
+
+    def __init__(self, data, host='127.0.0.1', port=0):
+        """
+        :param data: records from generate_workspace()
+        :param port: port to listen on, by default any free port"""
+        self.data = data
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.bodies = self._bodies(data)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://{0}:{1}/api'.format(host, port)
+
+    def _bodies(self, data):
+        """Encoded response body for every path that can be requested"""
+        workspace = {'id': WORKSPACE_ID, 'type': 'Workspace',
+                'name': 'Benchmarks'}
+        bodies = {
+            '/api/account': {'id': 1, 'type': 'Account',
+                    'user_name': 'benchmarks', 'workspaces': [workspace]},
+            '/api/workspaces': [workspace],
+            '/api/workspaces/{0}'.format(WORKSPACE_ID): workspace,
+        }
+
+        for name, records in data.items():
+            url = '/api/workspaces/{0}/{1}'.format(WORKSPACE_ID, name)
+            bodies[url] = records
+            for record in records:
+                bodies[url + '/' + str(record['id'])] = record
+
+        return dict((path, json.dumps(body).encode('utf-8'))
+                for path, body in bodies.items())
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,509 @@
+"""asyncio versions of the LiquidPlanner API and managers.
+
+Requires Python 3.7+ and aiohttp. Managers and models behave exactly like
+their synchronous counterparts, except that every method which talks to the
+API returns a coroutine:
+
+    async with AsyncLiquidPlanner(credentials) as lp:
+        task = await lp.tasks.get(1234)
+        comments = await task.comments.all()
+"""
+
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+from .api import LiquidPlanner
+from .exceptions import LiquidPlannerException
+from .manager import Manager
+from .models import Model
+from .results import ResultSet
+from .utils import JSONArrayDecoder
+
+
+# Errors for a single request, reported per record by the bulk methods
+REQUEST_ERRORS = (LiquidPlannerException, aiohttp.ClientError,
+        asyncio.TimeoutError)
+
+
+async def gather_concurrently(func, items, max_workers, catch=()):
+    """Await func(item) for each of items, at most max_workers at a time,
+    and return the results in order, as utils.map_concurrently() does
+
+    :param catch: exception types returned in place of a result"""
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def call(item):
+        async with semaphore:
+            try:
+                return await func(item)
+            except catch as e:
+                return e
+
+    return list(await asyncio.gather(*[call(item) for item in items]))
+
+
+class AsyncResponse(object):
+    """A fully read aiohttp response, exposing the parts of the requests
+    response interface that response handling and exceptions rely on."""
+
+    class Request(object):
+        def __init__(self, method):
+            self.method = method
+
+    def __init__(self, method, status_code, headers, content, encoding=None):
+        self.request = self.Request(method)
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.text = content.decode(encoding or 'utf-8', 'replace')
+
+
+async def download(manager, url, dest, chunk_size=65536, progress=None):
+    """Stream a response body to a file, as transfer.download() does, and
+    return the size of the body. Files are written in a thread, so the
+    event loop isn't blocked by the disk.
+
+    A failed connection isn't carried on from where it stopped, but
+    raises, leaving what was received in the file.
+
+    :param manager: the AsyncManager to make the request with
+    :param url: url of the body, relative to the manager's base url
+    :param dest: path of the file to write, or a writable file object.
+        A file is only opened once the server starts sending the body.
+    :param chunk_size: number of bytes read from the connection at a time
+    :param progress: called with (bytes received, total bytes) after every
+        chunk. Total bytes is None if the server doesn't say."""
+    loop = asyncio.get_running_loop()
+
+    with manager._measure('get', url) as metrics:
+        async with manager._open('get', url,
+                headers={'Accept-Encoding': 'identity'},
+                metrics=metrics) as r:
+            if r.status != 200:
+                content = await r.read()
+                manager._check_response(AsyncResponse('GET', r.status,
+                        r.headers, content, r.charset))
+
+            total = r.headers.get('Content-Length')
+            if total is not None:
+                total = int(total)
+
+            file = dest
+            if isinstance(dest, str):
+                file = await loop.run_in_executor(None, open, dest, 'wb')
+
+            started = time.time()
+            received = 0
+            try:
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    await loop.run_in_executor(None, file.write, chunk)
+                    received += len(chunk)
+                    if progress is not None:
+                        progress(received, total)
+            finally:
+                if file is not dest:
+                    await loop.run_in_executor(None, file.close)
+                if metrics is not None:
+                    metrics.add_download(time.time() - started, received)
+
+            return received
+
+
+async def _read_chunks(body):
+    """Read a transfer.MultipartStream in a thread, a chunk at a time"""
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, body.read, body.chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class AsyncModel(Model):
+    """A Model whose convenience methods and associated objects are async"""
+
+    def _association(self, name):
+        return AsyncManager(self.manager.config, name, self.uri + '/' + name)
+
+    def thumbnail_to(self, dest, **kwargs):
+        """As Model.thumbnail_to(), see aio.download()"""
+        return download(self.manager, self.uri + '/thumbnail', dest, **kwargs)
+
+    def download_to(self, dest, **kwargs):
+        """As Model.download_to(), see aio.download()"""
+        return download(self.manager, self.uri + '/download', dest, **kwargs)
+
+
+class AsyncManager(Manager):
+    """A Manager where all(), get(), create(), update() and delete(), and
+    the bulk methods, must be awaited"""
+
+    model_class = AsyncModel
+
+    async def _make_request(self, method, url, data=None, params=None, headers=None):
+        with self._measure(method, url) as metrics:
+            response = await self._request(method, url, data, params,
+                    headers, metrics)
+            return self._handle_response(response, url, metrics)
+
+    async def _request(self, method, url, data=None, params=None,
+            headers=None, metrics=None):
+        """Make a request and return the whole AsyncResponse"""
+        return await self._request_body(method, url, self._serialize(data),
+                params, headers, metrics)
+
+    async def _request_body(self, method, url, body, params=None,
+            headers=None, metrics=None):
+        """As _request(), with the body already serialized"""
+        async with self._open(method, url, body, params, headers,
+                metrics) as r:
+            started = time.time()
+            content = await r.read()
+            if metrics is not None:
+                metrics.add_download(time.time() - started)
+
+            return AsyncResponse(method.upper(), r.status, r.headers,
+                    content, r.charset)
+
+    @contextlib.asynccontextmanager
+    async def _open(self, method, url, body=None, params=None, headers=None,
+            metrics=None):
+        """Make a request, waiting for the client's rate limiter and
+        retrying with its retry policy, and yield the aiohttp response as
+        soon as its headers have been received, so the body can be
+        streamed
+
+        :param body: the request body, already serialized
+        :param metrics: RequestMetrics to record the timings in, or None"""
+        self._check_options()
+        started = time.time()
+
+        session = self.config._get_session()
+        full_uri = self.base_url + url
+        params = self._flatten_params(params)
+
+        rate_limiter = self.config.rate_limiter
+        retry = self.config.retry
+
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                await self._acquire(rate_limiter)
+
+            attempt_started = time.time()
+            try:
+                r = await session.request(method.upper(), full_uri,
+                        data=body, headers=headers, params=params,
+                        auth=self.config.auth,
+                        timeout=aiohttp.ClientTimeout(total=self.timeout))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if retry is None or not retry.should_retry(method, attempt):
+                    raise
+                delay = retry.delay(attempt)
+            else:
+                # The retry policy only needs the status and headers
+                head = AsyncResponse(method.upper(), r.status, r.headers, b'')
+                if retry is None or not retry.should_retry(method, attempt, head):
+                    break
+                delay = retry.delay(attempt, head)
+                r.release()
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if metrics is not None:
+            finished = time.time()
+            metrics.status = r.status
+            metrics.retries = attempt
+            metrics.wait_time = finished - attempt_started
+            metrics.total_time = finished - started
+
+        try:
+            yield r
+        finally:
+            r.release()
+
+    async def _acquire(self, rate_limiter):
+        """Wait for the rate limiter without blocking the event loop"""
+        while True:
+            wait = rate_limiter.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def _check_options(self):
+        # Both use locks that would block the event loop
+        if self.config.cache is not None:
+            raise ValueError("The asyncio client doesn't support a cache")
+        if self.config.single_flight is not None:
+            raise ValueError("The asyncio client doesn't support coalesce")
+
+    def _get(self, url, params=None):
+        self._check_options()
+        return self._make_request('get', url, params=params)
+
+    def _flatten_params(self, params):
+        """aiohttp doesn't expand list values the way requests does, so
+        turn params into a list of pairs (e.g. for 'filter[]')"""
+        if not params:
+            return None
+
+        pairs = []
+        for key, value in params.items():
+            if isinstance(value, (list, tuple)):
+                pairs.extend((key, str(v)) for v in value)
+            else:
+                pairs.append((key, str(value)))
+        return pairs
+
+    async def all(self, include=None, filters=None, filter_conjunction=None,
+            order=None, limit=None, depth=None, leaves=None, compact=False):
+        """As Manager.all()"""
+        if not compact:
+            return await super(AsyncManager, self).all(include, filters,
+                    filter_conjunction, order, limit, depth, leaves)
+
+        params = self._list_params(include, filters, filter_conjunction,
+                order, limit, depth, leaves)
+        url = self._format_url(self.url)
+
+        with self._measure('get', url) as metrics:
+            response = await self._request('get', url, params=params,
+                    metrics=metrics)
+            self._check_response(response)
+            return ResultSet(self, url, self._decode(response, metrics))
+
+    async def all_partitioned(self, partitions, include=None, filters=None,
+            order=None, depth=None, leaves=None, max_workers=8):
+        """As Manager.all_partitioned(), with the requests made
+        concurrently on the event loop"""
+        filters = list(filters or [])
+
+        if isinstance(partitions, int):
+            oldest = await self.all(filters=filters, order='updated_at',
+                    limit=1, depth=depth, leaves=leaves)
+            partitions = self._partition_by_updated_at(oldest, partitions)
+
+        def fetch(partition):
+            return self.all(include=include, filters=filters + list(partition),
+                    order=order, depth=depth, leaves=leaves)
+
+        return self._merge_partitions(
+                await gather_concurrently(fetch, partitions, max_workers))
+
+    async def iter_all(self, include=None, filters=None,
+            filter_conjunction=None, order=None, limit=None, depth=None,
+            leaves=None, chunk_size=65536):
+        """As Manager.iter_all(), but an asynchronous iterator:
+
+            async for task in lp.tasks.iter_all():
+                ..."""
+        params = self._list_params(include, filters, filter_conjunction,
+                order, limit, depth, leaves)
+
+        url = self._format_url(self.url)
+
+        with self._measure('get', url) as metrics:
+            async with self._open('get', url, params=params,
+                    metrics=metrics) as r:
+                if r.status not in (200, 201):
+                    content = await r.read()
+                    self._check_response(AsyncResponse('GET', r.status,
+                            r.headers, content, r.charset))
+
+                decoder = JSONArrayDecoder()
+                started = time.time()
+                size = 0
+                try:
+                    async for chunk in r.content.iter_chunked(chunk_size):
+                        size += len(chunk)
+                        for d in decoder.feed(chunk):
+                            yield self._model(d,
+                                    url + "/" + str(d.get("id", "")))
+                        if decoder.done:
+                            return
+
+                    for d in decoder.feed(b'', final=True):
+                        yield self._model(d, url + "/" + str(d.get("id", "")))
+                finally:
+                    if metrics is not None:
+                        metrics.add_download(time.time() - started, size)
+
+    async def get_many(self, ids, include=None, max_workers=8):
+        """As Manager.get_many(), with the requests made concurrently on
+        the event loop"""
+        def get(id):
+            return self.get(id, include=include)
+
+        return await gather_concurrently(get, ids, max_workers,
+                catch=REQUEST_ERRORS)
+
+    async def create_many(self, objs, max_workers=8):
+        """As Manager.create_many()"""
+        return await gather_concurrently(self.create, objs, max_workers,
+                catch=REQUEST_ERRORS)
+
+    async def update_many(self, updates, max_workers=8):
+        """As Manager.update_many()"""
+        def update(pair):
+            return self.update(*pair)
+
+        return await gather_concurrently(update, updates, max_workers,
+                catch=REQUEST_ERRORS)
+
+    async def delete_many(self, ids, max_workers=8):
+        """As Manager.delete_many()"""
+        return await gather_concurrently(self.delete, ids, max_workers,
+                catch=REQUEST_ERRORS)
+
+    async def upload(self, file, filename=None, description=None,
+            chunk_size=65536):
+        """As Manager.upload(). The file is read in a thread, so the event
+        loop isn't blocked by the disk."""
+        url = self._format_url(self.url)
+        body = self._upload_body(file, filename, description, chunk_size)
+        headers = {'Content-Type': body.content_type,
+                'Content-Length': str(len(body))}
+
+        with self._measure('post', url) as metrics:
+            try:
+                response = await self._request_body('post', url,
+                        _read_chunks(body), headers=headers, metrics=metrics)
+            finally:
+                body.close()
+
+            return self._handle_response(response, url, metrics)
+
+    async def upload_many(self, files, max_workers=4):
+        """As Manager.upload_many()"""
+        return await gather_concurrently(self.upload, files, max_workers,
+                catch=REQUEST_ERRORS)
+
+
+class AsyncLiquidPlanner(LiquidPlanner):
+    """An asyncio interface to the LiquidPlanner API.
+
+    The first workspace can't be looked up while constructing the object,
+    so it is selected when entering the ``async with`` block (or by
+    awaiting ``select_first_workspace()``)."""
+
+    manager_class = AsyncManager
+
+    def __init__(self, credentials, use_first_workspace=True,
+            pool_maxsize=100, date_keys=None, workspace_id=None,
+            base_url=None, rate_limiter=None, retry=None, listeners=None):
+        """
+        The response cache and coalescing aren't supported, as they would
+        block the event loop.
+
+        :param credentials: credentials used to authenticate every request
+        :param use_first_workspace: use the first workspace when entered
+        :param pool_maxsize: max number of simultaneous connections
+        :param date_keys: only convert dates in fields with these names
+        :param workspace_id: id of the workspace to use
+        :param base_url: URL of the API, if not LiquidPlanner's own
+        :param rate_limiter: a TokenBucket limiting the rate of requests
+        :param retry: a RetryPolicy for requests that fail
+        :param listeners: functions called with a RequestMetrics after each
+            request"""
+        super(AsyncLiquidPlanner, self).__init__(credentials,
+                use_first_workspace=False, date_keys=date_keys,
+                workspace_id=workspace_id, base_url=base_url,
+                rate_limiter=rate_limiter, retry=retry, listeners=listeners)
+        self.use_first_workspace = use_first_workspace
+        self._pool_maxsize = pool_maxsize
+
+        # The client whose aiohttp session this one uses, if it's a copy
+        # made by for_workspace()
+        self._session_owner = None
+
+        basic = credentials.auth
+        self.auth = aiohttp.BasicAuth(basic.username, basic.password)
+
+    def _create_session(self, pool_connections, pool_maxsize, max_retries):
+        # aiohttp sessions must be created inside the event loop, so this is
+        # done by _get_session() when a request is made
+        return None
+
+    def _get_session(self):
+        if self._session_owner is not None:
+            return self._session_owner._get_session()
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_maxsize),
+                headers=self._default_headers())
+        return self.session
+
+    async def select_first_workspace(self):
+        workspaces = await self.workspaces.all()
+        self.workspace_id = workspaces[0]['id']
+
+    def for_workspace(self, workspace_id):
+        """As LiquidPlanner.for_workspace(). The copy uses this client's
+        aiohttp session, even if it hasn't been opened yet, so closing
+        this client closes it; closing the copy does nothing."""
+        clone = super(AsyncLiquidPlanner, self).for_workspace(workspace_id)
+        clone._session = None
+        clone._session_owner = self._session_owner or self
+        return clone
+
+    async def fan_out(self, func, workspace_ids=None, max_workers=8):
+        """As LiquidPlanner.fan_out(), with func returning a coroutine,
+        e.g. await fan_out(lambda lp: lp.projects.all())"""
+        if workspace_ids is None:
+            workspace_ids = [workspace['id']
+                    for workspace in await self.workspaces.all()]
+
+        clients = [self.for_workspace(id) for id in workspace_ids]
+        results = await gather_concurrently(func, clients, max_workers,
+                catch=REQUEST_ERRORS)
+
+        return OrderedDict(zip(workspace_ids, results))
+
+    async def close(self):
+        if self._session_owner is None and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        if self.use_first_workspace and self.workspace_id is None:
+            await self.select_first_workspace()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+def webhook_application(receiver, path='/'):
+    """An aiohttp application serving a webhooks.WebhookReceiver at path.
+
+    Deliveries are received in a thread, as a receiver created with
+    background=False updates its mirror (with blocking requests) before
+    responding."""
+    from aiohttp import web
+
+    async def handle(request):
+        body = await request.read()
+        status = await asyncio.get_running_loop().run_in_executor(None,
+                receiver.receive, request.method, request.query_string,
+                request.headers.get, body)
+        return web.Response(status=status)
+
+    app = web.Application()
+    app.router.add_route('*', path, handle)
+    return app
+
+
+async def serve_webhooks(receiver, host='0.0.0.0', port=8080, path='/'):
+    """Start serving a webhooks.WebhookReceiver. Returns the aiohttp runner;
+    await its cleanup() to stop."""
+    from aiohttp import web
+
+    runner = web.AppRunner(webhook_application(receiver, path))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
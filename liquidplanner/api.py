@@ -1,4 +1,12 @@
-from .manager import Manager
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+from .flight import SingleFlight
+from .identity import IdentityMap
+from .manager import Manager, request_errors
+from .utils import map_concurrently
 
 class LiquidPlanner(object):
     """An ORM-like interface to the LiquidPlanner API"""
@@ -34,6 +42,11 @@ class LiquidPlanner(object):
             ('treeitems', '/workspaces/{workspace_id}/treeitems', {}),
     )
 
+    _MANAGER_URLS = dict((manager[0], manager[1]) for manager in MANAGERS)
+
+    # Managers for each entity are instances of this class
+    manager_class = Manager
+
     # Valid options for the include parameter. Not enforced, but here as
     # a reference (and can be passed if you want to include everything)
     ASSOCIATED_RECORDS = [
@@ -42,13 +55,177 @@ class LiquidPlanner(object):
             'tags', 'timer'
     ]
 
-    def __init__(self, credentials, use_first_workspace=True):
-        self.workspace_id = None
+    # Fields that hold dates and times. Can be passed as date_keys to only
+    # convert these fields, instead of checking every string in a response
+    DATE_KEYS = frozenset([
+            'created_at', 'updated_at', 'started_on', 'done_on',
+            'expected_start', 'expected_finish', 'earliest_start',
+            'earliest_finish', 'latest_finish', 'p98_finish', 'promise_by',
+            'delay_until', 'last_logged', 'start_date', 'finish_date',
+            'start', 'finish', 'running_since',
+    ])
+
+    def __init__(self, credentials, use_first_workspace=True,
+            pool_connections=10, pool_maxsize=10, max_retries=0,
+            date_keys=None, cache=None, rate_limiter=None, retry=None,
+            coalesce=False, workspace_id=None, listeners=None, base_url=None,
+            timeout=10, codec=None, identity_map=False):
+        """
+        Nothing is set up until it's needed: managers are created when they
+        are first used, and so is the HTTP session.
+
+        :param credentials: credentials used to authenticate every request
+        :param use_first_workspace: if no workspace id is given (or set in
+            the LP_WORKSPACE_ID environment variable), look up and use the
+            first workspace when a workspace id is first needed
+        :param pool_connections: number of connection pools to cache
+        :param pool_maxsize: max connections kept alive in each pool
+        :param max_retries: retries for failed connections (not for failed
+            requests), passed to the underlying HTTP adapter
+        :param date_keys: only convert dates in fields with these names
+            (e.g. DATE_KEYS), rather than in every field
+        :param cache: a ResponseCache for all() and get() requests
+        :param rate_limiter: a TokenBucket limiting the rate of requests
+        :param retry: a RetryPolicy for requests that fail
+        :param coalesce: share one request between threads making the same
+            GET request at the same time
+        :param workspace_id: id of the workspace to use
+        :param listeners: functions called with a RequestMetrics after each
+            request, such as an instrumentation.EndpointStats
+        :param base_url: URL of the API, if not LiquidPlanner's own (e.g. a
+            local server for testing)
+        :param timeout: seconds to wait for the server before giving up
+        :param codec: encodes and decodes JSON, e.g. codec.fastest(). The
+            json module is used by default.
+        :param identity_map: keep one Model for each entity, updated
+            whenever it is fetched again"""
+        if workspace_id is None and os.environ.get('LP_WORKSPACE_ID'):
+            workspace_id = int(os.environ['LP_WORKSPACE_ID'])
+        self._workspace_id = workspace_id
+        self._use_first_workspace = use_first_workspace
+        self._workspace_lock = threading.Lock()
+
         self.credentials = credentials
+        self.date_keys = date_keys
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.single_flight = SingleFlight() if coalesce else None
+        self.listeners = list(listeners or [])
+        self.base_url = base_url
+        self.timeout = timeout
+        self.codec = codec
+        self.identity_map = IdentityMap() if identity_map else None
+
+        self._session = None
+        self._session_options = (pool_connections, pool_maxsize, max_retries)
+        self._session_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Only called for attributes that don't exist yet. Create managers
+        # on first use, and keep them as attributes from then on.
+        url = self._MANAGER_URLS.get(name)
+        if url is None:
+            raise AttributeError(name)
+
+        manager = self.manager_class(self, name, url)
+        setattr(self, name, manager)
+        return manager
+
+    @property
+    def workspace_id(self):
+        if self._workspace_id is None and self._use_first_workspace:
+            with self._workspace_lock:
+                if self._workspace_id is None:
+                    self._workspace_id = self.workspaces.all()[0]['id']
+        return self._workspace_id
+
+    @workspace_id.setter
+    def workspace_id(self, value):
+        self._workspace_id = value
+
+    def for_workspace(self, workspace_id):
+        """A copy of this client that uses another workspace.
+
+        The copy shares the HTTP session (and its connections), cache,
+        rate limiter and other options with this client, so many can be
+        used at once, e.g. one in each thread."""
+        clone = copy.copy(self)
+
+        # Managers read the workspace id from the client that made them
+        for name in self._MANAGER_URLS:
+            clone.__dict__.pop(name, None)
+
+        clone._workspace_id = workspace_id
+        clone._workspace_lock = threading.Lock()
+        clone._session = self.session
+
+        return clone
+
+    def fan_out(self, func, workspace_ids=None, max_workers=8):
+        """Call func with a client for each workspace, several at a time,
+        e.g. fan_out(lambda lp: lp.projects.all())
+
+        Returns an OrderedDict of workspace id to what func returned, or
+        to the exception raised by a request it made (e.g.
+        LiquidPlannerUnauthorized). Other exceptions are raised.
+
+        :param workspace_ids: ids of the workspaces, by default all of them
+        :param max_workers: max number of workspaces queried at once"""
+        if workspace_ids is None:
+            workspace_ids = [workspace['id'] for workspace in self.workspaces.all()]
+
+        clients = [self.for_workspace(id) for id in workspace_ids]
+        results = map_concurrently(func, clients, max_workers,
+                catch=request_errors())
+
+        return OrderedDict(zip(workspace_ids, results))
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session(*self._session_options)
+        return self._session
+
+    @session.setter
+    def session(self, value):
+        self._session = value
+
+    def _create_session(self, pool_connections, pool_maxsize, max_retries):
+        """Create the HTTP session shared by every manager of this client,
+        including those created on demand for associated objects. Reusing
+        the session keeps connections alive between requests."""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize, max_retries=max_retries)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        session.headers.update(self._default_headers())
+
+        return session
+
+    def _default_headers(self):
+        """Headers sent with every request"""
+        import requests
+        from liquidplanner import __version__ as VERSION
 
-        for manager in self.MANAGERS:
-            setattr(self, manager[0], Manager(self, *manager[0:2]))
+        return {
+            # Use the JSON API
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
 
-        if use_first_workspace:
-            self.workspace_id = self.workspaces.all()[0]['id']
+            # Set a user-agent so LiquidPlanner knows the traffic is 
+            # coming from pyliquidplanner
+            'User-Agent': 'pyliquidplanner/{0} {1}'.format(
+                VERSION, requests.utils.default_user_agent()),
 
+            # Make sure we get the expected API version
+            'X-API-Version': '3.0.0',
+        }
@@ -1,14 +1,12 @@
 from __future__ import unicode_literals
 
 
-from requests.auth import HTTPBasicAuth
-
-
 class BasicCredentials(object):
     """Object to allow authentication with LiquidPlanner via 
     HTTP basic credentials.
     """
 
     def __init__(self, email, password):
+        from requests.auth import HTTPBasicAuth
         self.auth = HTTPBasicAuth(email, password)
 
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .utils import request_key
+
+
+class CacheEntry(object):
+    """A cached response body and the headers needed to revalidate it"""
+
+    __slots__ = ('text', 'expires', 'etag', 'last_modified')
+
+    def __init__(self, text, expires, etag=None, last_modified=None):
+        self.text = text
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def validators(self):
+        """Headers that make a conditional request for this entry, or None
+        if the server didn't give us any validators"""
+        headers = {}
+
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers or None
+
+
+class ResponseCache(object):
+    """A size limited LRU cache of responses for Manager.all() and get().
+
+    Entries are kept for a time that depends on the type of entity, and are
+    dropped whenever a create, update, delete or convenience method changes
+    an entity of the same type. Expired entries that came with an ETag or
+    Last-Modified header are revalidated with a conditional request, so the
+    body only needs to be downloaded again if it has changed."""
+
+    # These are all different views of tree items, so a change to any of
+    # them may change the others
+    TREE_TYPES = frozenset([
+            'treeitems', 'tasks', 'projects', 'folders', 'packages',
+            'milestones', 'events', 'partial_day_events',
+    ])
+
+    # Convenience methods that also change other types of entity, e.g.
+    # tracking time on a task adds to its timesheet entries
+    SIDE_EFFECTS = {
+        'track_time': frozenset(['timesheets', 'timesheet_entries']),
+        'timer': frozenset(['timesheets', 'timesheet_entries']),
+    }
+
+    def __init__(self, max_entries=1024, ttl=60, ttls=None):
+        """
+        :param max_entries: max number of responses to keep
+        :param ttl: seconds a response is used without asking the server
+        :param ttls: dict of entity type (e.g. 'members') to the ttl for it"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.ttls = ttls or {}
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Incremented by every invalidate(), so responses to requests made
+        # before a change aren't stored after it
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def generation(self):
+        """Pass to set() the generation from before the request was made"""
+        return self._generation
+
+    def key(self, url, params=None):
+        """The cache key for a request"""
+        return request_key(url, params)
+
+    def get(self, key):
+        """The entry for key, which may have expired, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Mark as the most recently used
+                del self._entries[key]
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, entity_type, text, etag=None, last_modified=None,
+            generation=None):
+        """Store a response body
+
+        :param entity_type: name of the manager, used to pick the ttl
+        :param generation: the cache's generation when the request was
+            made. The body isn't stored if anything has been invalidated
+            since, as it may be out of date."""
+        expires = time.time() + self.ttls.get(entity_type, self.ttl)
+        entry = CacheEntry(text, expires, etag, last_modified)
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key, entity_type):
+        """Mark an entry as fresh again, after the server said it hasn't
+        changed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = time.time() + self.ttls.get(entity_type, self.ttl)
+
+    def invalidate(self, url):
+        """Drop every entry that may be affected by a change made at url.
+
+        For example a change to /workspaces/1/tasks/5/comments drops all
+        cached tasks and comments (and other tree items) in workspace 1."""
+        segments = url.strip('/').split('/')
+
+        if segments[0] == 'workspaces' and len(segments) > 2:
+            base = '/workspaces/' + segments[1] + '/'
+
+            names = set(s for s in segments[2:] if not s.isdigit())
+            for name in list(names):
+                names |= self.SIDE_EFFECTS.get(name, frozenset())
+            if names & self.TREE_TYPES:
+                names |= self.TREE_TYPES
+
+            prefixes = [base + name for name in names]
+        else:
+            # The account or a whole workspace
+            prefixes = ['/' + '/'.join(segments[:2])]
+
+        with self._lock:
+            self._generation += 1
+
+            for key in list(self._entries):
+                for prefix in prefixes:
+                    if key == prefix or key.startswith((prefix + '/', prefix + '?')):
+                        del self._entries[key]
+                        break
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
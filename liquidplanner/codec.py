@@ -0,0 +1,50 @@
+"""Encoding request bodies and decoding responses.
+
+Pass a codec to the API to choose how JSON is handled:
+
+    lp = LiquidPlanner(credentials, codec=codec.fastest())
+
+Every codec encodes dates as ISO 8601 strings, as JSONCodec does.
+"""
+
+import json
+
+from .utils import json_default
+
+
+class JSONCodec(object):
+    """The json module from the standard library"""
+
+    def dumps(self, data):
+        return json.dumps(data, default=json_default)
+
+    def loads(self, data):
+        """Decode a response body, as bytes (UTF-8) or text"""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(object):
+    """orjson (https://github.com/ijl/orjson), which encodes and decodes
+    several times faster than the standard library, and encodes dates
+    itself"""
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, data):
+        # Bytes, which requests and aiohttp send as they are
+        return self._orjson.dumps(data, default=json_default)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+def fastest():
+    """The fastest codec that is installed"""
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JSONCodec()
@@ -38,6 +38,10 @@ class LiquidPlannerNotFound(LiquidPlannerException):
     # HTTP 404: Not Found
     pass
 
+class LiquidPlannerTooManyRequests(LiquidPlannerException):
+    # HTTP 429: Too Many Requests
+    pass
+
 class LiquidPlannerInternalError(LiquidPlannerException):
     # HTTP 500: Internal Server Error
     pass
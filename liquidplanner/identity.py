@@ -0,0 +1,85 @@
+import threading
+import weakref
+
+from .utils import underscore
+
+
+class IdentityMap(object):
+    """Keeps a single Model for each entity, keyed by its type and id.
+
+    When an entity is fetched again, by any manager (e.g. tasks.all(),
+    treeitems.all() or tasks.get()), the Model already in use is given the
+    new values (dropping fields the new copy doesn't have) and returned,
+    rather than creating another copy.
+    Entities included in another (e.g. with include=['comments']) are
+    shared too.
+
+    Models are only held by weak references, so they are freed as usual
+    once nothing else uses them."""
+
+    def __init__(self):
+        self._models = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+        # singular type (e.g. 'timesheet_entry') -> manager name
+        self._type_names = None
+
+    def __len__(self):
+        return len(self._models)
+
+    def get(self, type, id):
+        """The Model in use for an entity, or None
+
+        :param type: type from the API, e.g. 'Task', or the singular name
+            of a manager, e.g. 'task'"""
+        return self._models.get((underscore(type), id))
+
+    def add(self, model):
+        """The shared Model for the entity in model, which is model itself
+        unless there already was one"""
+        self._share_included(model)
+
+        # The API's types (e.g. 'Task') and the managers' names for them
+        # (e.g. 'task') are the same once underscored
+        key = (underscore(model.get('type') or model.object_type),
+                model.get('id'))
+        if key[1] is None:
+            return model
+
+        with self._lock:
+            existing = self._models.get(key)
+            if existing is None:
+                self._models[key] = model
+                return model
+
+            for name in set(existing) - set(model):
+                del existing[name]
+            existing.update(model)
+            return existing
+
+    def _share_included(self, model):
+        """Replace included entities with their shared Models"""
+        for key, value in model.items():
+            if isinstance(value, dict):
+                model[key] = self._included(model.manager, value)
+            elif isinstance(value, list):
+                model[key] = [self._included(model.manager, inner)
+                        if isinstance(inner, dict) else inner
+                        for inner in value]
+
+    def _included(self, manager, record):
+        if record.get('id') is None or not record.get('type'):
+            return record
+
+        config = manager.config
+        if self._type_names is None:
+            self._type_names = dict((getattr(config, name[0]).singular, name[0])
+                    for name in config.MANAGERS)
+
+        name = self._type_names.get(underscore(record['type']))
+        if name is None:
+            return record
+
+        included = getattr(config, name)
+        uri = included._format_url(included.url) + '/' + str(record['id'])
+        return self.add(included.model_class(included, record, uri))
@@ -0,0 +1,196 @@
+"""Measuring the requests made to LiquidPlanner.
+
+Pass listeners to the API to be called with a RequestMetrics after every
+request. EndpointStats is a listener that aggregates them by endpoint:
+
+    stats = EndpointStats()
+    lp = LiquidPlanner(credentials, listeners=[stats])
+    ...
+    print(stats.to_json())
+"""
+
+import bisect
+import json
+import re
+import threading
+from collections import deque
+
+
+WORKSPACE_REGEX = re.compile(r'^/workspaces/\d+')
+ID_REGEX = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_template(url):
+    """The url with ids replaced by placeholders, so requests for different
+    records are grouped together, e.g. /workspaces/{workspace_id}/tasks/{id}"""
+    url = WORKSPACE_REGEX.sub('/workspaces/{workspace_id}', url)
+    return ID_REGEX.sub('/{id}', url)
+
+
+class RequestMetrics(object):
+    """Measurements of one request. Times are in seconds, and are None
+    when they weren't measured.
+
+    requests doesn't report how long it took to connect, so connect_time
+    is always None and wait_time includes it."""
+
+    __slots__ = ('method', 'endpoint', 'status', 'connect_time', 'wait_time',
+            'download_time', 'total_time', 'response_size', 'decode_time',
+            'date_time', 'retries', 'coalesced', 'error')
+
+    def __init__(self, method, url):
+        self.method = method.upper()
+        self.endpoint = endpoint_template(url)
+
+        # HTTP status code of the final response
+        self.status = None
+
+        # Time until the response headers were received, time to read the
+        # body after that, and the total including retries and throttling
+        self.connect_time = None
+        self.wait_time = None
+        self.download_time = None
+        self.total_time = None
+
+        # Size of the response body in bytes
+        self.response_size = None
+
+        # Time to decode the JSON body, and to convert its dates and wrap
+        # it in models
+        self.decode_time = None
+        self.date_time = None
+
+        # Number of times the request was retried
+        self.retries = 0
+
+        # True if the response was shared with an identical request
+        # already in flight (see the coalesce option), rather than fetched
+        self.coalesced = False
+
+        # Exception raised by the request, if any
+        self.error = None
+
+    def share(self, leader, total_time):
+        """Record that this request shared the response to another
+
+        :param leader: the RequestMetrics of the request that was made, or
+            None if it wasn't measured
+        :param total_time: time this request spent waiting for it"""
+        self.coalesced = True
+        self.total_time = total_time
+
+        if leader is not None:
+            self.status = leader.status
+            self.wait_time = leader.wait_time
+            self.download_time = leader.download_time
+
+    def add_download(self, seconds, size=None):
+        """Add the time (and bytes) taken to read a body after the request
+        returned, e.g. a streamed one"""
+        self.download_time = (self.download_time or 0) + seconds
+        self.total_time = (self.total_time or 0) + seconds
+
+        if size is not None:
+            self.response_size = (self.response_size or 0) + size
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__
+                if name != 'error')
+
+
+def percentile(sorted_values, p):
+    """The p-th percentile (0-100) of a sorted list, by nearest rank"""
+    if not sorted_values:
+        return None
+    rank = int(round(p / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+class EndpointStats(object):
+    """Aggregates RequestMetrics by method and endpoint.
+
+    Keeps a histogram of total request times, the most recent samples of
+    each time for percentiles, and totals of counts and bytes."""
+
+    # Upper bounds (seconds) of the histogram buckets
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+    TIMES = ('wait_time', 'download_time', 'total_time', 'decode_time',
+            'date_time')
+
+    def __init__(self, samples=1000):
+        """
+        :param samples: number of recent requests used for percentiles"""
+        self.samples = samples
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, metrics):
+        key = metrics.method + ' ' + metrics.endpoint
+
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = {
+                    'count': 0,
+                    'coalesced': 0,
+                    'errors': 0,
+                    'retries': 0,
+                    'response_bytes': 0,
+                    'histogram': [0] * len(self.BUCKETS),
+                    'times': dict((name, deque(maxlen=self.samples))
+                            for name in self.TIMES),
+                }
+
+            stats['count'] += 1
+            if metrics.coalesced:
+                stats['coalesced'] += 1
+            stats['retries'] += metrics.retries
+            stats['response_bytes'] += metrics.response_size or 0
+            if metrics.error is not None:
+                stats['errors'] += 1
+
+            if metrics.total_time is not None:
+                bucket = bisect.bisect_left(self.BUCKETS, metrics.total_time)
+                stats['histogram'][bucket] += 1
+
+            for name in self.TIMES:
+                value = getattr(metrics, name)
+                if value is not None:
+                    stats['times'][name].append(value)
+
+    def export(self, percentiles=(50, 95, 99)):
+        """All the statistics as a dict, keyed by 'METHOD endpoint'"""
+        result = {}
+
+        with self._lock:
+            for key, stats in self._endpoints.items():
+                times = {}
+                for name, values in stats['times'].items():
+                    values = sorted(values)
+                    if values:
+                        times[name] = dict(
+                            ('p{0}'.format(p), percentile(values, p))
+                            for p in percentiles)
+                        times[name]['mean'] = sum(values) / len(values)
+
+                result[key] = {
+                    'count': stats['count'],
+                    'coalesced': stats['coalesced'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'response_bytes': stats['response_bytes'],
+                    'histogram': dict(
+                        (str(bound), count) for bound, count in
+                        zip(self.BUCKETS, stats['histogram'])),
+                    'times': times,
+                }
+
+        return result
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.export(), **kwargs)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
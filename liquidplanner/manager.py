@@ -1,15 +1,38 @@
 from __future__ import unicode_literals
 
 
+import contextlib
 import datetime
-import requests
+import time
 
+from six import integer_types
+
+from .codec import JSONCodec
 from .exceptions import *
+from .instrumentation import RequestMetrics
 from .models import Model
+from .partition import by_updated_at
+from .results import ResultSet
+from .transfer import MultipartStream
+from .utils import iter_json_array, map_concurrently, request_key
+
+
+# Used when the client doesn't have a codec
+DEFAULT_CODEC = JSONCodec()
+
+
+def request_errors():
+    """Errors for a single request, reported per record by the bulk methods"""
+    # requests is only imported when it's needed, so the library loads fast
+    from requests.exceptions import RequestException
+    return (LiquidPlannerException, RequestException)
 
 
 class Manager(object):
 
+    # Records returned by the API are wrapped in this class
+    model_class = Model
+
     def __init__(self, config, name, url):
         self.config = config
         self.name = name
@@ -23,44 +46,179 @@ class Manager(object):
         else:
             self.singular = self.name
 
-        self.base_url = "https://app.liquidplanner.com/api"
-        self.timeout = 10 # seconds
+        self.base_url = (getattr(config, 'base_url', None) or
+                "https://app.liquidplanner.com/api")
+        self.timeout = getattr(config, 'timeout', 10) # seconds
 
     def _make_request(self, method, url, data=None, params=None, headers=None):
-        from liquidplanner import __version__ as VERSION
-        if headers is None:
-            headers = {}
-
-        # Use the JSON API
-        headers['Accept'] = 'application/json'
-        headers['Content-Type'] = 'application/json'
-
-        # Set a user-agent so LiquidPlanner knows the traffic is 
-        # coming from pyliquidplanner
-        headers['User-Agent'] = 'pyliquidplanner/{0} {1}'.format(
-                VERSION, requests.utils.default_user_agent())
-
-        # Make sure we get the expected API version
-        headers['X-API-Version'] = '3.0.0'
-
-        serialized_data = None
-        if data:
-            def default(obj):
-                if isinstance(obj, datetime.datetime):
-                    return obj.isoformat()
-                return obj
-
-            # JSON encode the body, with date handling
-            serialized_data = json.dumps(data, default=default)
-
+        with self._measure(method, url) as metrics:
+            response = self._send(method, url, data=data, params=params,
+                    headers=headers, metrics=metrics)
+
+            return self._handle_response(response, url, metrics)
+
+    @contextlib.contextmanager
+    def _measure(self, method, url):
+        """Pass a RequestMetrics to the client's listeners once the block
+        finishes. Yields None if there are no listeners."""
+        listeners = getattr(self.config, 'listeners', None)
+        if not listeners:
+            yield None
+            return
+
+        metrics = RequestMetrics(method, url)
+        try:
+            yield metrics
+        except Exception as e:
+            metrics.error = e
+            raise
+        finally:
+            for listener in listeners:
+                listener(metrics)
+
+    def _send(self, method, url, data=None, params=None, headers=None,
+            metrics=None, **kwargs):
+        """Send a request and return the raw response
+
+        :param metrics: RequestMetrics to record the timings in, or None
+        :param kwargs: extra arguments for the session (e.g. stream)"""
+        single_flight = getattr(self.config, 'single_flight', None)
+        if single_flight is not None and method == 'get' and not kwargs:
+            # Identical GETs made while this one is in flight share its
+            # response
+            key = (request_key(self.base_url + url, params),
+                    tuple(sorted((headers or {}).items())))
+
+            started = time.time()
+            response, leader = single_flight.do(key, lambda: (
+                self._send_request(method, url, data, params, headers, metrics),
+                metrics))
+
+            if metrics is not None and leader is not metrics:
+                metrics.share(leader, time.time() - started)
+
+            return response
+
+        return self._send_request(method, url, data, params, headers,
+                metrics, **kwargs)
+
+    def _send_request(self, method, url, data, params, headers, metrics,
+            **kwargs):
+        from requests.exceptions import ConnectionError, Timeout
+
+        started = time.time()
+
+        # The standard headers (JSON content type, user-agent and API
+        # version) are set once on the shared session, so only extra
+        # headers need to be passed through here
         full_uri = self.base_url + url
-
-        response = getattr(requests, method)(
-            full_uri, data=serialized_data, headers=headers, params=params,
-            auth=self.config.credentials.auth, timeout=self.timeout)
-
+        serialized_data = self._serialize(data)
+
+        rate_limiter = getattr(self.config, 'rate_limiter', None)
+        retry = getattr(self.config, 'retry', None)
+
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+
+            attempt_started = time.time()
+            try:
+                response = getattr(self.config.session, method)(
+                    full_uri, data=serialized_data, headers=headers, params=params,
+                    auth=self.config.credentials.auth, timeout=self.timeout, **kwargs)
+            except (ConnectionError, Timeout):
+                if retry is None or not retry.should_retry(method, attempt):
+                    raise
+                delay = retry.delay(attempt)
+            else:
+                if retry is None or not retry.should_retry(method, attempt, response):
+                    break
+                delay = retry.delay(attempt, response)
+                response.close()
+
+            time.sleep(delay)
+            attempt += 1
+
+        if metrics is not None:
+            finished = time.time()
+            metrics.status = response.status_code
+            metrics.retries = attempt
+            metrics.total_time = finished - started
+
+            # requests measures the time until the headers arrived
+            metrics.wait_time = response.elapsed.total_seconds()
+            metrics.download_time = max(0,
+                    finished - attempt_started - metrics.wait_time)
+
+        cache = getattr(self.config, 'cache', None)
+        if cache is not None and method != 'get':
+            cache.invalidate(url)
+
+        return response
+
+    def _get(self, url, params=None):
+        """Make a GET request, using the client's response cache if it has
+        one"""
+        cache = getattr(self.config, 'cache', None)
+        if cache is None:
+            return self._make_request('get', url, params=params)
+
+        key = cache.key(url, params)
+        entry = cache.get(key)
+
+        headers = None
+        if entry is not None:
+            if entry.is_fresh():
+                return self._parse_data(self._codec().loads(entry.text), url)
+
+            # Ask the server if our copy is still current
+            headers = entry.validators()
+            if headers is None:
+                entry = None
+
+        generation = cache.generation
+
+        with self._measure('get', url) as metrics:
+            response = self._send('get', url, params=params, headers=headers,
+                    metrics=metrics)
+
+            if response.status_code == 304 and entry is not None:
+                cache.refresh(key, self.name)
+                return self._parse_data(self._codec().loads(entry.text), url)
+
+            self._check_response(response)
+
+            cache.set(key, self.name, response.text,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                    generation)
+
+            return self._parse_api_response(response, url, metrics)
+
+    def _serialize(self, data):
+        """JSON encode a request body, with date handling. Streams (such as
+        a MultipartStream) are sent as they are."""
+        if hasattr(data, 'read'):
+            return data
+
+        if not data:
+            return None
+
+        return self._codec().dumps(data)
+
+    def _codec(self):
+        return getattr(self.config, 'codec', None) or DEFAULT_CODEC
+
+    def _handle_response(self, response, url, metrics=None):
+        """Parse a successful response, or raise the matching exception"""
+        self._check_response(response)
+
+        return self._parse_api_response(response, url, metrics)
+
+    def _check_response(self, response):
+        """Raise the matching exception if the response isn't a success"""
         if response.status_code in [200, 201]:
-            return self._parse_api_response(response, url)
+            return
 
         elif response.status_code == 400:
             raise LiquidPlannerBadRequest(response)
@@ -74,6 +232,9 @@ class Manager(object):
         elif response.status_code == 404:
             raise LiquidPlannerNotFound(response)
 
+        elif response.status_code == 429:
+            raise LiquidPlannerTooManyRequests(response)
+
         elif response.status_code == 500:
             raise LiquidPlannerInternalError(response)
 
@@ -87,26 +248,81 @@ class Manager(object):
             raise LiquidPlannerException(response, 
                 msg="Unknown HTTP response code: {0}".format(response.status_code))
 
-    def _parse_api_response(self, response, base_url):
+    def _parse_api_response(self, response, base_url, metrics=None):
         # We expect only JSON encoded replies. We simply deserialize and return.
-        data = response.json()
+        created = response.request.method == "POST"
+
+        data = self._decode(response, metrics)
 
+        if metrics is None:
+            return self._parse_data(data, base_url, created)
+
+        started = time.time()
+        result = self._parse_data(data, base_url, created)
+        metrics.date_time = time.time() - started
+
+        return result
+
+    def _decode(self, response, metrics=None):
+        """Decode a whole JSON response body, recording how long it took"""
+        if metrics is None:
+            return self._codec().loads(response.content)
+
+        started = time.time()
+        data = self._codec().loads(response.content)
+
+        metrics.decode_time = time.time() - started
+        metrics.response_size = len(response.content)
+
+        return data
+
+    def _iter_content(self, response, chunk_size, metrics=None):
+        """Read a streamed response body, adding the time and bytes taken
+        to metrics"""
+        if metrics is None:
+            for chunk in response.iter_content(chunk_size):
+                yield chunk
+            return
+
+        started = time.time()
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size):
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.add_download(time.time() - started, size)
+
+    def _parse_data(self, data, base_url, created=False):
+        """Wrap deserialized response data in models
+
+        :param created: True if the data is a newly created object"""
         if isinstance(data, dict):
             # This is a single object response
 
-            if response.request.method == "POST":
+            if created:
                 # This was a 'create', we need to add the object ID to the url
                 base_url = base_url + "/" + str(data.get("id", ""))
 
-            return Model(self, data, base_url)
+            return self._model(data, base_url)
         else:
             # Multiple object response
             items = []
             for d in data:
                 uri = base_url + "/" + str(d.get("id", ""))
-                items.append(Model(self, d, uri))
+                items.append(self._model(d, uri))
             return items
 
+    def _model(self, data, uri):
+        """Wrap a record in a Model, or update the one already in use for
+        it if the client has an identity map"""
+        model = self.model_class(self, data, uri)
+
+        identity_map = getattr(self.config, 'identity_map', None)
+        if identity_map is None:
+            return model
+        return identity_map.add(model)
+
     def _format_url(self, url, tokens=None):
         if tokens is None:
             tokens = {}
@@ -117,7 +333,7 @@ class Manager(object):
         return url.format(**tokens)
 
     def all(self, include=None, filters=None, filter_conjunction=None,
-            order=None, limit=None, depth=None, leaves=None):
+            order=None, limit=None, depth=None, leaves=None, compact=False):
         """Fetch all records
         
         :param include: list of related entities to include
@@ -126,7 +342,125 @@ class Manager(object):
         :param order: sort order, one of 'earliest_start' or 'updated_at'
         :param limit: max number of records to return (only for tasks)
         :param depth: limit tree depth (only makes sense for treeitems)
-        :param leaves: include leaf nodes (only makes sense for treeitems)"""
+        :param leaves: include leaf nodes (only makes sense for treeitems)
+        :param compact: return a ResultSet instead of a list of Models"""
+        params = self._list_params(include, filters, filter_conjunction,
+                order, limit, depth, leaves)
+
+        url = self._format_url(self.url)
+
+        if compact:
+            with self._measure('get', url) as metrics:
+                response = self._send('get', url, params=params,
+                        metrics=metrics)
+                self._check_response(response)
+                return ResultSet(self, url, self._decode(response, metrics))
+
+        return self._get(url, params=params)
+
+    def all_partitioned(self, partitions, include=None, filters=None,
+            order=None, depth=None, leaves=None, max_workers=8):
+        """Fetch all records with one smaller request for each partition,
+        several at a time, e.g.
+
+            lp.tasks.all_partitioned(partition.by_project(project_ids),
+                    filters=['is_done is false'])
+
+        Each response is smaller and quicker than one for the whole list.
+        Records returned by more than one partition are only included once
+        (the most recently updated copy). Records are in partition order,
+        so order only applies within each partition.
+
+        :param partitions: lists of filters, see the partition module. Each
+            list is combined with filters, so together they must cover
+            every record wanted. Or a number of partitions to split the
+            query into by updated_at, from the least recently updated
+            record (found with an extra request) until now.
+        :param max_workers: max number of requests made at once
+
+        The other parameters are as for all()."""
+        filters = list(filters or [])
+
+        if isinstance(partitions, integer_types):
+            oldest = self.all(filters=filters, order='updated_at', limit=1,
+                    depth=depth, leaves=leaves)
+            partitions = self._partition_by_updated_at(oldest, partitions)
+
+        def fetch(partition):
+            return self.all(include=include, filters=filters + list(partition),
+                    order=order, depth=depth, leaves=leaves)
+
+        return self._merge_partitions(
+                map_concurrently(fetch, partitions, max_workers))
+
+    def _partition_by_updated_at(self, oldest, count):
+        """count partitions between the least recently updated record,
+        oldest is a list holding it, and now"""
+        if not oldest or oldest[0].get('updated_at') is None:
+            # Nothing to split, so one request for the whole query
+            return [[]]
+
+        return by_updated_at(oldest[0]['updated_at'],
+                datetime.datetime.utcnow(), count)
+
+    def _merge_partitions(self, partition_results):
+        """Combine the records of each partition, without duplicates"""
+        records = []
+        positions = {}
+        for results in partition_results:
+            for record in results:
+                id = record.get('id')
+
+                if id in positions:
+                    if self._is_newer(record, records[positions[id]]):
+                        records[positions[id]] = record
+                    continue
+
+                if id is not None:
+                    positions[id] = len(records)
+                records.append(record)
+
+        return records
+
+    def _is_newer(self, record, other):
+        updated_at = record.get('updated_at')
+        other_updated_at = other.get('updated_at')
+
+        if updated_at is None or other_updated_at is None:
+            return False
+        return updated_at > other_updated_at
+
+    def iter_all(self, include=None, filters=None, filter_conjunction=None,
+            order=None, limit=None, depth=None, leaves=None, chunk_size=65536):
+        """Fetch all records, one at a time
+
+        Takes the same parameters as all(), but the response is streamed
+        and records are yielded as soon as they have been received, so the
+        full list is never held in memory. The request is made when
+        iteration starts.
+
+        :param chunk_size: number of bytes to read from the response at once"""
+        params = self._list_params(include, filters, filter_conjunction,
+                order, limit, depth, leaves)
+
+        url = self._format_url(self.url)
+
+        with self._measure('get', url) as metrics:
+            response = self._send('get', url, params=params, metrics=metrics,
+                    stream=True)
+            try:
+                self._check_response(response)
+
+                chunks = self._iter_content(response, chunk_size, metrics)
+                for d in iter_json_array(chunks):
+                    uri = url + "/" + str(d.get("id", ""))
+                    yield self._model(d, uri)
+            finally:
+                response.close()
+
+    def _list_params(self, include, filters, filter_conjunction, order,
+            limit, depth, leaves):
+        """Build the query string parameters for all() and iter_all()"""
         params = {}
 
         if include is not None:
@@ -150,9 +484,7 @@ class Manager(object):
         if leaves:
             params["leaves"] = "true"
 
-        url = self._format_url(self.url)
-
-        return self._make_request('get', url, params=params)
+        return params
 
     def _help_json(self):
         return self._make_request('get', 'help.json')
@@ -181,7 +513,22 @@ class Manager(object):
         
         url = self._format_url(self.url + "/{id}", {"id": id})
 
-        return self._make_request('get', url, params=params)
+        return self._get(url, params=params)
+
+    def get_many(self, ids, include=None, max_workers=8):
+        """Get the records with the given ids, several at a time
+
+        Results are in the same order as ids. When a record can't be
+        fetched, the exception raised for it (e.g. LiquidPlannerNotFound)
+        is returned in its place instead of stopping the other requests.
+
+        :param ids: ids of the records to fetch
+        :param include: optional list of related entities to include
+        :param max_workers: max number of requests made at once"""
+        def get(id):
+            return self.get(id, include=include)
+
+        return map_concurrently(get, ids, max_workers, catch=request_errors())
 
     def update(self, id, obj):
         """Save an existing record.
@@ -202,3 +549,81 @@ class Manager(object):
         url = self._format_url(self.url + "/{id}", {"id": id})
 
         return self._make_request('delete', url)
+
+    def create_many(self, objs, max_workers=8):
+        """Insert new records, several at a time
+
+        Results are in the same order as objs. When a record can't be
+        created, the exception raised for it (e.g.
+        LiquidPlannerUnprocessableEntity) is returned in its place instead
+        of stopping the other requests.
+
+        :param objs: values for each new record
+        :param max_workers: max number of requests made at once"""
+        return map_concurrently(self.create, objs, max_workers,
+                catch=request_errors())
+
+    def update_many(self, updates, max_workers=8):
+        """Save existing records, several at a time
+
+        Results and errors are returned as for create_many().
+
+        :param updates: list of (id, obj) pairs
+        :param max_workers: max number of requests made at once"""
+        def update(pair):
+            return self.update(*pair)
+
+        return map_concurrently(update, updates, max_workers,
+                catch=request_errors())
+
+    def delete_many(self, ids, max_workers=8):
+        """Delete existing records, several at a time
+
+        Results and errors are returned as for create_many().
+
+        :param ids: ids of the records to delete
+        :param max_workers: max number of requests made at once"""
+        return map_concurrently(self.delete, ids, max_workers,
+                catch=request_errors())
+
+    def upload(self, file, filename=None, description=None, chunk_size=65536):
+        """Upload a document, e.g. task.documents.upload('plan.pdf')
+
+        The file is streamed from disk, so it is never held in memory.
+
+        :param file: path of the file, or a binary file object
+        :param filename: name for the document, defaults to the file's name
+        :param description: optional description of the document
+        :param chunk_size: number of bytes read from the file at a time"""
+        url = self._format_url(self.url)
+        body = self._upload_body(file, filename, description, chunk_size)
+
+        with self._measure('post', url) as metrics:
+            try:
+                response = self._send('post', url, data=body,
+                        headers={'Content-Type': body.content_type},
+                        metrics=metrics)
+            finally:
+                body.close()
+
+            return self._handle_response(response, url, metrics)
+
+    def _upload_body(self, file, filename, description, chunk_size):
+        fields = []
+        if description is not None:
+            fields.append((self.singular + '[description]', description))
+
+        return MultipartStream(fields,
+                [(self.singular + '[attached_file]', file, filename)],
+                chunk_size=chunk_size)
+
+    def upload_many(self, files, max_workers=4):
+        """Upload documents, several at a time
+
+        Only one chunk of each file being uploaded is in memory at once.
+        Results and errors are returned as for create_many().
+
+        :param files: paths or binary file objects
+        :param max_workers: max number of uploads at once"""
+        return map_concurrently(self.upload, files, max_workers,
+                catch=request_errors())
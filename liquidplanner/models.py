@@ -1,38 +1,88 @@
-import dateutil.parser
+import datetime
 import re
 from six import iteritems, string_types
 
+from .transfer import download
+
+
+# ISO 8601 date format, as returned by the API
+DATE_REGEX = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2})\:(\d{2})\:(\d{2})([+-])(\d{2})\:(\d{2})$')
+
+# tzinfo objects are shared by all dates with the same UTC offset
+_timezones = {}
+
+
+def parse_date(value):
+    """Convert an ISO 8601 date string from the API into a datetime.datetime
+
+    Returns None if value isn't in the format used by the API. This is much
+    faster than dateutil.parser.parse, but gives the same results."""
+    # Cheap checks first, since most strings aren't dates
+    if len(value) != 25 or value[10] != 'T':
+        return None
+
+    match = DATE_REGEX.match(value)
+    if match is None:
+        return None
+
+    (year, month, day, hour, minute, second,
+        sign, offset_hours, offset_minutes) = match.groups()
+
+    offset = int(offset_hours) * 3600 + int(offset_minutes) * 60
+    if sign == '-':
+        offset = -offset
+
+    tz = _timezones.get(offset)
+    if tz is None:
+        from dateutil.tz import tzoffset, tzutc
+        tz = tzutc() if offset == 0 else tzoffset(None, offset)
+        _timezones[offset] = tz
+
+    return datetime.datetime(int(year), int(month), int(day),
+            int(hour), int(minute), int(second), tzinfo=tz)
+
+
+def convert_dates(data, keys=None):
+    """Recursively search through data for string that look like dates and convert
+    them to datetime.datetime objects
+
+    :param keys: if given, only values of these keys are checked"""
+    for key, value in iteritems(data):
+        if isinstance(value, string_types):
+            if keys is None or key in keys:
+                date = parse_date(value)
+                if date is not None:
+                    # This is a date! Convert it
+                    data[key] = date
+        elif isinstance(value, dict):
+            # This is a dict, recurse
+            convert_dates(value, keys)
+        elif isinstance(value, list):
+            # This is a list, recurse if any dicts present
+            for inner in value:
+                if isinstance(inner, dict):
+                    convert_dates(inner, keys)
+
 
 class Model(dict):
     """Holds a response from the liquid planner API"""
     
-    # ISO 8601 date format
-    DATE_REGEX = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2})\:(\d{2})\:(\d{2})[+-](\d{2})\:(\d{2})$')
+    DATE_REGEX = DATE_REGEX
 
     def __init__(self, manager, data, uri):
         self.manager = manager
         self.object_type = manager.singular
         self.uri = uri
         
-        self._convert_dates(data)
+        self._convert_dates(data,
+                getattr(manager.config, 'date_keys', None))
 
         super(Model, self).__init__(data)
 
-    def _convert_dates(self, data):
+    def _convert_dates(self, data, keys=None):
         """Recursively search through data for string that look like dates and convert
         them to datetime.datetime objects"""
-        for key, value in iteritems(data):
-            if isinstance(value, string_types) and self.DATE_REGEX.match(value):
-                # This is a date! Convert it
-                data[key] = dateutil.parser.parse(value)
-            elif isinstance(value, dict):
-                # This is a dict, recurse
-                self._convert_dates(value)
-            elif isinstance(value, list):
-                # This is a list, recurse if any dicts present
-                for inner in value:
-                    if isinstance(inner, dict):
-                        self._convert_dates(inner)
+        convert_dates(data, keys)
 
     def update_assignment(self, obj):
         """Update assignment attributes for a treeitem.
@@ -100,6 +150,20 @@ class Model(dict):
         """Download a document."""
         return self.manager._make_request('get', self.uri + '/download')
 
+    def thumbnail_to(self, dest, **kwargs):
+        """Stream a thumbnail of a document to a file.
+
+        :param dest: path of the file to write, or a writable file object
+        :param kwargs: options for transfer.download()"""
+        return download(self.manager, self.uri + '/thumbnail', dest, **kwargs)
+
+    def download_to(self, dest, **kwargs):
+        """Stream a document to a file, without holding it in memory.
+
+        :param dest: path of the file to write, or a writable file object
+        :param kwargs: options for transfer.download(), e.g. progress"""
+        return download(self.manager, self.uri + '/download', dest, **kwargs)
+
     def track_time(self, obj):
         """Convenient way to track time and update estimates
         
@@ -150,58 +214,52 @@ class Model(dict):
     # This feels a little hackish and circular referencey. It works well though,
     # creating the managers on demand is efficient when retrieving long lists of
     # objects (as opposed to instantiating them as object attributes)
+    def _association(self, name):
+        """Create a manager for objects associated with this one"""
+        from .manager import Manager
+        return Manager(self.manager.config, name, self.uri + '/' + name)
+
     @property
     def activities(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'activities', self.uri + '/activities')
+        return self._association('activities')
 
     @property
     def comments(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'comments', self.uri + '/comments')
+        return self._association('comments')
 
     @property
     def dependencies(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'dependencies', self.uri + '/dependencies')
+        return self._association('dependencies')
 
     @property
     def dependents(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'dependents', self.uri + '/dependents')
+        return self._association('dependents')
 
     @property
     def documents(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'documents', self.uri + '/documents')
+        return self._association('documents')
     
     @property
     def estimates(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'estimates', self.uri + '/estimates')
+        return self._association('estimates')
 
     @property
     def links(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'links', self.uri + '/links')
+        return self._association('links')
 
     @property
     def note(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'note', self.uri + '/note')
+        return self._association('note')
 
     @property
     def snapshots(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'snapshots', self.uri + '/snapshots')
+        return self._association('snapshots')
 
     @property
     def tags(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'tags', self.uri + '/tags')
+        return self._association('tags')
 
     @property
     def timer(self):
-        from .manager import Manager
-        return Manager(self.manager.config, 'timer', self.uri + '/timer')
+        return self._association('timer')
 
@@ -0,0 +1,72 @@
+"""Ways to split a list query into smaller ones, for Manager.all_partitioned().
+
+Each function returns a list of partitions, where a partition is a list of
+extra filters. Together the partitions should cover every record the
+query would return. They may overlap, as results are deduplicated.
+"""
+
+import datetime
+
+from dateutil.tz import tzutc
+
+
+def by_updated_at(start, end, count, overlap=datetime.timedelta(seconds=1)):
+    """Split by when records were last updated, into count windows of equal
+    length between start and end.
+
+    The first window has no lower bound and the last no upper bound, so
+    records updated before start or after end aren't missed. Windows
+    overlap slightly so records updated exactly on a boundary are always
+    included.
+
+    :param start: datetime.datetime, naive times are taken to be UTC
+    :param end: datetime.datetime
+    :param count: number of windows
+    :param overlap: timedelta added to each side of every boundary"""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    start = _utc(start)
+    step = (_utc(end) - start) // count
+    boundaries = [start + step * i for i in range(1, count)]
+
+    partitions = []
+    for i in range(count):
+        filters = []
+        if i > 0:
+            filters.append('updated_at after {0}'.format(
+                _format(boundaries[i - 1] - overlap)))
+        if i < count - 1:
+            filters.append('updated_at before {0}'.format(
+                _format(boundaries[i] + overlap)))
+        partitions.append(filters)
+
+    return partitions
+
+
+def by_project(projects):
+    """One partition for each project, e.g. for tasks
+
+    :param projects: project ids, or projects"""
+    return [['project_id = {0}'.format(_id(project))] for project in projects]
+
+
+def by_parent(parents):
+    """One partition for the children of each of parents, e.g. folders
+
+    :param parents: ids of tree items, or tree items"""
+    return [['parent_id = {0}'.format(_id(parent))] for parent in parents]
+
+
+def _id(value):
+    return value['id'] if isinstance(value, dict) else value
+
+
+def _utc(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=tzutc())
+    return value.astimezone(tzutc())
+
+
+def _format(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
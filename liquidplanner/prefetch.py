@@ -0,0 +1,118 @@
+from collections import OrderedDict
+
+from .utils import map_concurrently
+
+
+# Associations that are a single record rather than a list
+SINGLE_ASSOCIATIONS = frozenset(['note', 'timer'])
+
+
+def prefetch_related(models, names, whole_list=False, max_workers=8,
+        batch_size=100):
+    """Fetch associated records (e.g. comments) for many models at once,
+    and store them in each model under the association's name:
+
+        tasks = lp.tasks.all(filters=['is_done is false'])
+        prefetch_related(tasks, ['comments', 'documents'])
+        for task in tasks:
+            print(task['comments'])
+
+    Rather than a request for every association of every model, the models
+    are fetched again with include=names: by default with an all() request
+    filtered by id for each batch of models, or with whole_list a single
+    all() request for each type of model. Models the list doesn't return
+    (e.g. because of its default filters) are fetched one at a time, as
+    are associations the API doesn't include.
+
+    Returns the models.
+
+    :param models: Models from any managers
+    :param names: association names, e.g. ['comments', 'estimates']
+    :param whole_list: fetch the whole list of each type of model with one
+        request, which is quicker when the models are most of the list
+    :param max_workers: max number of requests made at once
+    :param batch_size: max number of ids in each filtered request"""
+    names = list(names)
+
+    # Models are refetched by the manager they came from
+    groups = OrderedDict()
+    for model in models:
+        groups.setdefault(model.manager, []).append(model)
+
+    for manager, group in groups.items():
+        records = _fetch(manager, group, names, whole_list, max_workers,
+                batch_size)
+
+        missing = []
+        for model in group:
+            record = records[model['id']]
+            for name in names:
+                if name in record:
+                    _attach(model, name, record[name])
+                else:
+                    missing.append((model, name))
+
+        def fetch_association(pair):
+            model, name = pair
+            return model._association(name).all()
+
+        results = map_concurrently(fetch_association, missing, max_workers)
+        for (model, name), result in zip(missing, results):
+            model[name] = result
+
+    return models
+
+
+def _fetch(manager, models, names, whole_list, max_workers, batch_size):
+    """id -> record including names, for each of models"""
+    records = {}
+
+    if whole_list:
+        for record in manager.all(include=names):
+            records[record.get('id')] = record
+    else:
+        ids = _missing_ids(models, records)
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+        def fetch(batch):
+            return manager.all(include=names, filters=[
+                    'id = ' + ','.join(str(id) for id in batch)])
+
+        for results in map_concurrently(fetch, batches, max_workers):
+            for record in results:
+                records[record.get('id')] = record
+
+    ids = _missing_ids(models, records)
+    if ids:
+        results = manager.get_many(ids, include=names, max_workers=max_workers)
+        for id, result in zip(ids, results):
+            if isinstance(result, Exception):
+                raise result
+            records[id] = result
+
+    return records
+
+
+def _missing_ids(models, records):
+    # ids stays in the models' order, seen makes the duplicate check cheap
+    ids, seen = [], set()
+    for model in models:
+        id = model['id']
+        if id not in records and id not in seen:
+            seen.add(id)
+            ids.append(id)
+    return ids
+
+
+def _attach(model, name, value):
+    """Store included records as Models of the association's manager"""
+    association = model._association(name)
+
+    if value is None:
+        model[name] = None if name in SINGLE_ASSOCIATIONS else []
+    elif isinstance(value, dict):
+        # A single record, e.g. the note
+        model[name] = association._model(dict(value), association.url)
+    else:
+        model[name] = association._parse_data(
+                [dict(record) for record in value], association.url)
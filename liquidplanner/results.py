@@ -0,0 +1,90 @@
+from six import iteritems
+
+from .models import convert_dates
+
+
+# Marks a field that a record doesn't have
+MISSING = object()
+
+
+class ResultSet(object):
+    """A compact list of records returned by the API.
+
+    The manager and base url are stored once for the whole list, and each
+    record is stored as a tuple of values, one for each of the column names
+    shared by every record. This takes a fraction of the memory of a list of
+    Model objects.
+
+    Indexing or iterating returns Model objects, created on demand, so the
+    usual dict access and associated objects are still available."""
+
+    def __init__(self, manager, base_url, records=()):
+        self.manager = manager
+        self.base_url = base_url
+
+        self.columns = []
+        self._column_index = {}
+        self._rows = []
+
+        date_keys = getattr(manager.config, 'date_keys', None)
+        for record in records:
+            convert_dates(record, date_keys)
+            self._append(record)
+
+    def _append(self, record):
+        row = [MISSING] * len(self.columns)
+
+        for key, value in iteritems(record):
+            index = self._column_index.get(key)
+            if index is None:
+                # A field that hasn't been seen before. Rows stored earlier
+                # are shorter, which also means missing.
+                index = len(self.columns)
+                self._column_index[key] = index
+                self.columns.append(key)
+                row.append(MISSING)
+            row[index] = value
+
+        self._rows.append(tuple(row))
+
+    def _record(self, row):
+        return dict((key, value) for key, value in zip(self.columns, row)
+                if value is not MISSING)
+
+    def _model(self, row):
+        record = self._record(row)
+        uri = self.base_url + "/" + str(record.get("id", ""))
+        return self.manager._model(record, uri)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        for row in self._rows:
+            yield self._model(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._model(row) for row in self._rows[index]]
+        return self._model(self._rows[index])
+
+    def column(self, key, default=None):
+        """The values of one field for every record, without creating
+        any Model objects
+
+        :param key: field name
+        :param default: value used for records without the field"""
+        index = self._column_index.get(key)
+        if index is None:
+            return [default] * len(self._rows)
+
+        values = []
+        for row in self._rows:
+            value = row[index] if index < len(row) else MISSING
+            values.append(default if value is MISSING else value)
+        return values
+
+    def records(self):
+        """Iterate over every record as a plain dict"""
+        for row in self._rows:
+            yield self._record(row)
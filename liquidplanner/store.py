@@ -0,0 +1,154 @@
+import datetime
+import json
+import sqlite3
+import threading
+
+from dateutil.tz import tzutc
+
+from .api import LiquidPlanner
+from .models import convert_dates
+from .utils import json_default
+
+
+class LocalStore(object):
+    """A SQLite database of entities, so they can be read and queried
+    without making any API requests.
+
+    There is one table for each entity type in LiquidPlanner.MANAGERS. Each
+    record is stored as JSON, alongside indexed columns for the fields that
+    are most often used to look records up."""
+
+    # Fields copied into their own indexed column
+    COLUMNS = ('parent_id', 'owner_id', 'updated_at', 'is_done')
+
+    def __init__(self, path=':memory:'):
+        """
+        :param path: database file, created if it doesn't exist"""
+        self.types = frozenset(manager[0] for manager in LiquidPlanner.MANAGERS)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self.connection:
+            for name in self.types:
+                self.connection.execute(
+                    'CREATE TABLE IF NOT EXISTS "{0}" ('
+                    'id INTEGER PRIMARY KEY, parent_id INTEGER, '
+                    'owner_id INTEGER, updated_at TEXT, is_done INTEGER, '
+                    'data TEXT NOT NULL)'.format(name))
+
+                for column in self.COLUMNS:
+                    self.connection.execute(
+                        'CREATE INDEX IF NOT EXISTS "{0}_{1}" '
+                        'ON "{0}" ({1})'.format(name, column))
+
+    def _table(self, name):
+        # Table names can't be query parameters, so only allow known ones
+        if name not in self.types:
+            raise ValueError("Unknown entity type: {0}".format(name))
+        return '"{0}"'.format(name)
+
+    def _value(self, value):
+        """A value as stored in a column. Datetimes are stored as ISO 8601
+        in UTC, so the column sorts and compares correctly, and naive ones
+        are taken to be UTC."""
+        if isinstance(value, datetime.datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=tzutc())
+            return value.astimezone(tzutc()).isoformat()
+        return value
+
+    def _row(self, record):
+        updated_at = self._value(record.get('updated_at'))
+
+        is_done = record.get('is_done')
+        if is_done is not None:
+            is_done = int(bool(is_done))
+
+        return (record['id'], record.get('parent_id'), record.get('owner_id'),
+                updated_at, is_done, json.dumps(record, default=json_default))
+
+    def _record(self, data):
+        record = json.loads(data)
+        convert_dates(record)
+        return record
+
+    def save(self, name, records):
+        """Add or replace records, e.g. the results of Manager.all() or get()
+
+        :param name: entity type, e.g. 'tasks'
+        :param records: a single record or a list of them"""
+        if isinstance(records, dict):
+            records = [records]
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO {0} '
+                '(id, parent_id, owner_id, updated_at, is_done, data) '
+                'VALUES (?, ?, ?, ?, ?, ?)'.format(self._table(name)),
+                (self._row(record) for record in records))
+
+    def delete(self, name, ids):
+        """Remove the records with the given ids"""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM {0} WHERE id = ?'.format(self._table(name)),
+                ((id,) for id in ids))
+
+    def get(self, name, id):
+        """The record with the given id, or None"""
+        records = self.query(name, 'id = ?', (id,))
+        return records[0] if records else None
+
+    def query(self, name, where=None, params=(), order_by=None, limit=None):
+        """Records matching a SQL condition on the indexed columns
+
+        :param where: condition, e.g. 'parent_id = ? AND is_done = 0'
+        :param params: values for the placeholders in where. Datetimes are
+            compared as they are stored, in UTC.
+        :param order_by: e.g. 'updated_at DESC'
+        :param limit: max number of records to return"""
+        sql = 'SELECT data FROM {0}'.format(self._table(name))
+
+        if where is not None:
+            sql += ' WHERE ' + where
+
+        if order_by is not None:
+            sql += ' ORDER BY ' + order_by
+
+        if limit is not None:
+            sql += ' LIMIT {0:d}'.format(limit)
+
+        with self._lock:
+            rows = self.connection.execute(sql,
+                    tuple(self._value(param) for param in params)).fetchall()
+
+        return [self._record(row[0]) for row in rows]
+
+    def filter(self, name, **columns):
+        """Records whose indexed columns equal the given values, e.g.
+        filter('tasks', parent_id=5, is_done=False)"""
+        conditions = []
+        params = []
+
+        for column, value in sorted(columns.items()):
+            if column != 'id' and column not in self.COLUMNS:
+                raise ValueError("Not an indexed column: {0}".format(column))
+
+            if value is None:
+                conditions.append('{0} IS NULL'.format(column))
+            else:
+                if isinstance(value, bool):
+                    value = int(value)
+                conditions.append('{0} = ?'.format(column))
+                params.append(value)
+
+        return self.query(name, ' AND '.join(conditions) or None, params)
+
+    def count(self, name):
+        with self._lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM {0}'.format(self._table(name))).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
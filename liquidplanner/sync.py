@@ -0,0 +1,160 @@
+import datetime
+
+from .exceptions import LiquidPlannerNotFound
+from .models import Model
+from .utils import underscore
+
+
+class WorkspaceMirror(object):
+    """A local copy of the entities in a workspace.
+
+    The first sync() fetches every entity of each type. After that, only
+    the workspace's list of changes since the previous sync is requested,
+    and just the entities it mentions are fetched again (or removed)."""
+
+    # Entity types mirrored by default. Tree items aren't included as
+    # they are the same records as projects, tasks, folders, etc.
+    DEFAULT_TYPES = (
+            'activities', 'members', 'clients', 'custom_fields', 'events',
+            'folders', 'milestones', 'packages', 'partial_day_events',
+            'projects', 'tasks', 'teams', 'comments', 'documents', 'links',
+            'checklist_items', 'tags', 'timesheet_entries', 'timesheets',
+    )
+
+    # Change types that mean the entity no longer exists
+    DELETIONS = frozenset(['delete', 'deleted', 'destroy', 'destroyed'])
+
+    def __init__(self, lp, types=DEFAULT_TYPES, max_workers=8):
+        """
+        :param lp: the LiquidPlanner API, with its workspace_id set
+        :param types: names of the entity types to mirror
+        :param max_workers: max number of requests made at once"""
+        self.lp = lp
+        self.types = tuple(types)
+        self.max_workers = max_workers
+
+        # name -> {id: Model}
+        self.records = dict((name, {}) for name in self.types)
+
+        # Latest updated_at seen. Changes since then are applied next sync.
+        self.cursor = None
+
+        # singular type (e.g. 'timesheet_entry') -> manager name
+        self._type_names = dict(
+                (getattr(lp, name).singular, name) for name in self.types)
+
+    def get(self, name, id, default=None):
+        return self.records[name].get(id, default)
+
+    def all(self, name):
+        return list(self.records[name].values())
+
+    def sync(self):
+        """Bring the mirror up to date.
+
+        Returns a set of (type name, id) for every entity that was added,
+        updated or removed."""
+        if self.cursor is None:
+            return self.full_sync()
+
+        workspace = self._workspace()
+        changes = workspace.changes({'since': self.cursor.isoformat()})
+
+        cursor = self.cursor
+        for change in changes:
+            cursor = self._latest(cursor, change)
+
+        updated = self.apply(changes)
+
+        # Only move on once everything has been applied, so nothing is
+        # missed if this sync fails part way through
+        self.cursor = cursor
+
+        return updated
+
+    def apply(self, changes):
+        """Remove the entities the changes say were deleted, and fetch the
+        others again. Changes are dicts with the 'type' (e.g. 'Task'), 'id'
+        and 'change_type' of an entity, as in the workspace's list of
+        changes or a webhook event.
+
+        Returns a set of (type name, id) for every entity that was added,
+        updated or removed."""
+        touched = dict((name, set()) for name in self.types)
+        removed = set()
+
+        for change in changes:
+            name = self._type_name(change.get('type'))
+            if name is None:
+                continue
+
+            id = change.get('id')
+            if change.get('change_type') in self.DELETIONS:
+                touched[name].discard(id)
+                if self.records[name].pop(id, None) is not None:
+                    removed.add((name, id))
+            else:
+                touched[name].add(id)
+
+        return self._fetch(touched) | removed
+
+    def full_sync(self):
+        """Fetch every entity again"""
+        cursor = None
+        updated = set()
+
+        for name in self.types:
+            records = {}
+            for record in getattr(self.lp, name).all():
+                records[record.get('id')] = record
+                cursor = self._latest(cursor, record)
+                updated.add((name, record.get('id')))
+            self.records[name] = records
+
+        self.cursor = cursor
+
+        return updated
+
+    def _fetch(self, touched):
+        """Fetch the given ids for each type, and store the results"""
+        updated = set()
+
+        for name, ids in touched.items():
+            if not ids:
+                continue
+
+            ids = list(ids)
+            results = getattr(self.lp, name).get_many(ids,
+                    max_workers=self.max_workers)
+
+            for id, result in zip(ids, results):
+                if isinstance(result, LiquidPlannerNotFound):
+                    # Deleted after the change was recorded
+                    self.records[name].pop(id, None)
+                elif isinstance(result, Exception):
+                    raise result
+                else:
+                    self.records[name][id] = result
+                updated.add((name, id))
+
+        return updated
+
+    def _workspace(self):
+        workspace_id = self.lp.workspace_id
+        return Model(self.lp.workspaces, {'id': workspace_id},
+                '/workspaces/' + str(workspace_id))
+
+    def _type_name(self, type):
+        """The manager name for a type from the change list (e.g. 'Task')"""
+        if not type:
+            return None
+
+        return self._type_names.get(underscore(type))
+
+    def _latest(self, cursor, record):
+        updated_at = record.get('updated_at')
+        if not isinstance(updated_at, datetime.datetime):
+            return cursor
+        if cursor is None or updated_at > cursor:
+            return updated_at
+        return cursor
@@ -0,0 +1,110 @@
+import email.utils
+import random
+import threading
+import time
+
+
+class TokenBucket(object):
+    """A thread safe token bucket, limiting the rate of requests.
+
+    Share one between every manager of an API (by passing it as the
+    rate_limiter) to limit the total rate, however many threads are making
+    requests."""
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: average number of requests allowed each second
+        :param capacity: max number of requests allowed in a burst,
+            defaults to rate"""
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request is allowed"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """Allow a request now if possible, without waiting. Returns 0 if
+        it is allowed, otherwise the seconds to wait before trying again
+        (which the asyncio client waits without blocking)."""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.capacity,
+                    self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+
+            return (1 - self._tokens) / self.rate
+
+
+class RetryPolicy(object):
+    """When and how long to wait before retrying a failed request.
+
+    Only idempotent methods are retried. The delay doubles on each attempt,
+    with random jitter so that many clients don't retry in step, unless the
+    server sends a Retry-After header."""
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30,
+            statuses=(429, 503), methods=('get', 'put', 'delete')):
+        """
+        :param max_retries: max number of times to retry a request
+        :param backoff: delay in seconds before the first retry
+        :param max_backoff: longest delay between retries
+        :param statuses: HTTP status codes worth retrying
+        :param methods: HTTP methods that are safe to retry"""
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+
+    def should_retry(self, method, attempt, response=None):
+        """Whether to retry after the given attempt (counting from 0).
+
+        :param response: the response, or None if the request failed
+            without one (e.g. a connection error)"""
+        if attempt >= self.max_retries or method not in self.methods:
+            return False
+
+        return response is None or response.status_code in self.statuses
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retrying, never more than max_backoff"""
+        if response is not None:
+            retry_after = self._retry_after(response)
+            if retry_after is not None:
+                # Don't let the server make us wait indefinitely
+                return min(retry_after, self.max_backoff)
+
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def _retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+
+        # Otherwise it's an HTTP date
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0, email.utils.mktime_tz(parsed) - time.time())
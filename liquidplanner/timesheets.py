@@ -0,0 +1,172 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .utils import iter_json_array
+
+
+class TimesheetTable(object):
+    """Timesheet entries held as numpy arrays, one for each column, for
+    fast totals over large numbers of entries. Requires numpy.
+
+    Entries are read straight from the JSON in the response, without
+    creating a Model (or converting the dates) for each one."""
+
+    # Integer columns. Missing ids are stored as -1.
+    ID_COLUMNS = ('id', 'member_id', 'item_id', 'project_id', 'activity_id')
+
+    COLUMNS = ID_COLUMNS + ('work_performed_on', 'hours')
+
+    # Columns group_by() can group on, besides the id columns
+    PERIODS = ('day', 'week')
+
+    def __init__(self, columns):
+        """
+        :param columns: dict of column name to numpy array, all the same
+            length"""
+        if numpy is None:
+            raise ImportError("numpy is required for timesheet tables")
+
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a table from timesheet entries, or from timesheets that
+        list their entries in a 'timesheet_entries' field"""
+        if numpy is None:
+            raise ImportError("numpy is required for timesheet tables")
+
+        values = dict((name, []) for name in cls.COLUMNS)
+
+        for record in records:
+            nested = record.get('timesheet_entries')
+            if nested is None:
+                entries = (record,)
+            else:
+                entries = nested
+
+            for entry in entries:
+                for name in cls.ID_COLUMNS:
+                    value = entry.get(name)
+                    if value is None and nested is not None:
+                        # e.g. the member is only given on the timesheet
+                        value = record.get(name) if name != 'id' else None
+                    values[name].append(-1 if value is None else value)
+
+                values['work_performed_on'].append(entry.get('work_performed_on'))
+                values['hours'].append(entry.get('work') or 0)
+
+        columns = dict((name, numpy.array(values[name], dtype=numpy.int64))
+                for name in cls.ID_COLUMNS)
+
+        # numpy parses the ISO dates itself, and stores missing ones as NaT
+        columns['work_performed_on'] = numpy.array(
+                values['work_performed_on'], dtype='datetime64[D]')
+        columns['hours'] = numpy.array(values['hours'], dtype=numpy.float64)
+
+        return cls(columns)
+
+    @classmethod
+    def fetch(cls, manager, filters=None, filter_conjunction=None,
+            chunk_size=65536):
+        """Download timesheet entries into a table, e.g.
+
+            TimesheetTable.fetch(lp.timesheet_entries,
+                    filters=['work_performed_on >= 2016-01-01'])
+
+        The response is streamed and decoded as it arrives.
+
+        :param manager: the timesheet_entries or timesheets manager
+        :param filters: filters for the request, as for Manager.all()
+        :param chunk_size: number of bytes to read from the response at once"""
+        params = manager._list_params(None, filters, filter_conjunction,
+                None, None, None, None)
+        url = manager._format_url(manager.url)
+
+        with manager._measure('get', url) as metrics:
+            response = manager._send('get', url, params=params,
+                    metrics=metrics, stream=True)
+            try:
+                manager._check_response(response)
+                return cls.from_records(iter_json_array(
+                        manager._iter_content(response, chunk_size, metrics)))
+            finally:
+                response.close()
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, name):
+        """numpy array of one column, or of day or week (the Monday the
+        week starts on)"""
+        if name == 'day':
+            return self.columns['work_performed_on']
+
+        if name == 'week':
+            # Day 0 (1970-01-01) was a Thursday, so Mondays are the days
+            # where (day + 3) is a multiple of 7
+            days = self.columns['work_performed_on']
+            numbers = days.astype(numpy.int64)
+            weeks = (numbers - (numbers + 3) % 7).astype('datetime64[D]')
+            weeks[numpy.isnat(days)] = numpy.datetime64('NaT')
+            return weeks
+
+        return self.columns[name]
+
+    def select(self, mask):
+        """A table of the rows where mask (a boolean array) is true, e.g.
+        table.select(table['member_id'] == 5)"""
+        return TimesheetTable(dict((name, column[mask])
+                for name, column in self.columns.items()))
+
+    def between(self, start, end):
+        """A table of the entries worked on from start up to (but not
+        including) end
+
+        :param start: a datetime.date or ISO date string
+        :param end: a datetime.date or ISO date string"""
+        days = self.columns['work_performed_on']
+        return self.select((days >= numpy.datetime64(start, 'D')) &
+                (days < numpy.datetime64(end, 'D')))
+
+    def group_by(self, *keys):
+        """Total hours and count entries for each combination of keys, e.g.
+        group_by('member_id', 'week').
+
+        Returns a dict of arrays: one for each key, holding the distinct
+        values in sorted order, plus 'hours' and 'count'.
+
+        :param keys: id columns, 'day' or 'week'"""
+        if not keys:
+            raise ValueError("At least one key is needed")
+
+        for key in keys:
+            if key not in self.ID_COLUMNS and key not in self.PERIODS:
+                raise ValueError("Can't group by {0}".format(key))
+
+        columns = [self[key] for key in keys]
+
+        # Group on integers, so dates can be combined with ids
+        stacked = numpy.stack(
+                [column.astype(numpy.int64) for column in columns], axis=1)
+        groups, inverse = numpy.unique(stacked, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        result = dict((key, groups[:, i].astype(column.dtype))
+                for i, (key, column) in enumerate(zip(keys, columns)))
+        result['hours'] = numpy.bincount(inverse,
+                weights=self.columns['hours'],
+                minlength=len(groups)).astype(numpy.float64)
+        result['count'] = numpy.bincount(inverse, minlength=len(groups))
+
+        return result
+
+    def by_member(self):
+        return self.group_by('member_id')
+
+    def by_project(self):
+        return self.group_by('project_id')
+
+    def by_week(self):
+        return self.group_by('week')
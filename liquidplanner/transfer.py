@@ -0,0 +1,381 @@
+import mimetypes
+import mmap
+import os
+import re
+import uuid
+
+from six import string_types, text_type
+
+
+CONTENT_RANGE_REGEX = re.compile(r'^bytes (\d+)-\d+/(\d+|\*)$')
+UNSATISFIED_RANGE_REGEX = re.compile(r'^bytes \*/(\d+)$')
+
+
+def download(manager, url, dest, chunk_size=65536, progress=None,
+        resume=False, use_mmap=False, max_resumes=3):
+    """Stream a response body to a file without holding it all in memory,
+    and return the size of the body.
+
+    If the connection fails part way through, the download carries on from
+    where it stopped with a Range request. It is made with an If-Range
+    header when the server sent an ETag or Last-Modified, so if the body
+    has changed since, the server sends all of it again instead. That, or
+    a server that ignores the Range header, starts the file again.
+
+    :param manager: the manager to make the request with
+    :param url: url of the body, relative to the manager's base url
+    :param dest: path of the file to write, or a writable file object.
+        A file is only opened (and an existing one changed) once the
+        server starts sending the body. A file object that can't seek,
+        e.g. a pipe, is written as the body arrives, so the download can't
+        carry on once any of it has been written.
+    :param chunk_size: number of bytes read from the connection at a time
+    :param progress: called with (bytes received, total bytes) after every
+        chunk. Total bytes is None if the server doesn't say.
+    :param resume: if dest is the path of an existing file, assume it holds
+        the start of this same body (from an interrupted download) and only
+        download the rest. There is nothing to check the file against, so
+        only use this when you know where the file came from.
+    :param use_mmap: write to a memory-mapped file, sized up front from
+        the Content-Length. Only used when dest is a path, the length is
+        known and the body isn't compressed.
+    :param max_resumes: times to carry on after a failed connection"""
+    if not isinstance(dest, string_types):
+        # Write from the file's current position
+        start = dest.tell() if _seekable(dest) else None
+        return _Download(manager, url, dest, start, 0, chunk_size,
+                progress).run(max_resumes)
+
+    offset = 0
+    if resume and os.path.exists(dest):
+        offset = os.path.getsize(dest)
+
+    transfer = _Download(manager, url, None, 0, offset, chunk_size, progress)
+    transfer.path = dest
+    transfer.use_mmap = use_mmap
+    try:
+        return transfer.run(max_resumes)
+    finally:
+        if transfer.file is not None:
+            transfer.file.close()
+
+
+def _seekable(file):
+    if hasattr(file, 'seekable'):
+        return file.seekable()
+
+    # Python 2 files have no seekable()
+    try:
+        file.tell()
+        return True
+    except (IOError, OSError):
+        return False
+
+
+class _Download(object):
+    """The state of one download, kept between attempts"""
+
+    def __init__(self, manager, url, file, start, received, chunk_size,
+            progress):
+        self.manager = manager
+        self.url = url
+        self.file = file
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.use_mmap = False
+
+        # If file is None, the path of the file, opened once the body is
+        # being received
+        self.path = None
+
+        # Position of the start of the body in the file (None if the file
+        # can't seek), and how much of the body has been written
+        self.start = start
+        self.received = received
+
+        self.total = None
+
+        # ETag or Last-Modified of the body being written, for If-Range
+        self.validator = None
+
+        # Set if the server compressed the body despite our asking it not
+        # to. Then the length and ranges are those of the compressed body,
+        # not of what is written, so we can't resume.
+        self.encoded = False
+
+    def run(self, max_resumes):
+        # requests is only imported when it's needed, so the library loads fast
+        from requests.exceptions import (ChunkedEncodingError,
+                ConnectionError, ReadTimeout)
+
+        attempt = 0
+        while True:
+            try:
+                self._attempt()
+                return self.received
+            except (ChunkedEncodingError, ConnectionError, ReadTimeout):
+                # What was written to a file that can't seek can't be
+                # replaced if the server sends the whole body again
+                if attempt >= max_resumes or (self.start is None and
+                        self.received):
+                    raise
+                attempt += 1
+
+    def _attempt(self):
+        with self.manager._measure('get', self.url) as metrics:
+            return self._attempt_measured(metrics)
+
+    def _attempt_measured(self, metrics):
+        # Ranges count bytes of the body as sent, so ask for it uncompressed
+        headers = {'Accept-Encoding': 'identity'}
+        if self.received and not self.encoded:
+            headers['Range'] = 'bytes={0}-'.format(self.received)
+            if self.validator is not None:
+                headers['If-Range'] = self.validator
+
+        response = self.manager._send('get', self.url, headers=headers,
+                metrics=metrics, stream=True)
+        try:
+            if response.status_code == 416 and 'Range' in headers:
+                if self._is_complete(response):
+                    return
+
+                # What we have isn't the start of this body
+                self._restart()
+                response.close()
+                return self._attempt()
+
+            if response.status_code == 206:
+                self._check_range(response)
+                self._open()
+            else:
+                self.manager._check_response(response)
+
+                # The whole body, so start again from the beginning
+                self._restart()
+                self.validator = self._validator(response)
+                self.encoded = response.headers.get(
+                        'Content-Encoding', 'identity') != 'identity'
+
+                length = response.headers.get('Content-Length')
+                if length is not None and not self.encoded:
+                    self.total = int(length)
+
+            chunks = self.manager._iter_content(response, self.chunk_size,
+                    metrics)
+            if self.use_mmap and self.total and not self.encoded:
+                self._write_mapped(chunks)
+            else:
+                self._write(chunks, self.file)
+        finally:
+            response.close()
+
+    def _open(self):
+        if self.file is None:
+            self.file = open(self.path, 'r+b' if self.received else 'w+b')
+            self.file.seek(self.received)
+
+    def _restart(self):
+        self._open()
+        self.received = 0
+        self.total = None
+        if self.start is None:
+            # Nothing has been written yet
+            return
+
+        self.file.seek(self.start)
+        if hasattr(self.file, 'truncate'):
+            self.file.truncate()
+
+    def _check_range(self, response):
+        """Check that a partial response carries on from what we have"""
+        content_range = response.headers.get('Content-Range', '')
+        match = CONTENT_RANGE_REGEX.match(content_range)
+        if match is None or int(match.group(1)) != self.received:
+            raise ValueError("Unexpected Content-Range: {0}".format(
+                content_range))
+
+        if match.group(2) != '*':
+            total = int(match.group(2))
+            if self.total is not None and total != self.total:
+                raise ValueError("Body length changed from {0} to {1}".format(
+                    self.total, total))
+            self.total = total
+
+    def _is_complete(self, response):
+        """Whether a 416 response says that we have the whole body"""
+        match = UNSATISFIED_RANGE_REGEX.match(
+                response.headers.get('Content-Range', ''))
+        if match is None:
+            return False
+
+        total = int(match.group(1))
+        return total == self.received and self.total in (None, total)
+
+    def _validator(self, response):
+        """The value for an If-Range header, or None. Weak ETags can't be
+        used there."""
+        etag = response.headers.get('ETag')
+        if etag is not None and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('Last-Modified')
+
+    def _write(self, chunks, file):
+        for chunk in chunks:
+            if not chunk:
+                continue
+            file.write(chunk)
+            self.received += len(chunk)
+            if self.progress is not None:
+                self.progress(self.received, self.total)
+
+    def _write_mapped(self, chunks):
+        # Size the file up front, then copy chunks straight into the
+        # mapped pages rather than through the file's buffers
+        self.file.flush()
+        self.file.truncate(self.start + self.total)
+
+        mapped = mmap.mmap(self.file.fileno(), self.start + self.total)
+        try:
+            mapped.seek(self.start + self.received)
+            self._write(chunks, mapped)
+            mapped.flush()
+        finally:
+            mapped.close()
+
+            # Leave the file at the end of what was written, and drop the
+            # unwritten part if the connection failed
+            self.file.truncate(self.start + self.received)
+            self.file.seek(self.start + self.received)
+
+
+class MultipartStream(object):
+    """A multipart/form-data request body, read from its files a chunk at a
+    time rather than built in memory.
+
+    requests sends it with read(), and a Content-Length from len()."""
+
+    def __init__(self, fields=(), files=(), chunk_size=65536, boundary=None):
+        """
+        :param fields: (name, value) pairs of text fields
+        :param files: (name, file, filename) triples, where file is a path
+            or a binary file object, read from its current position.
+            filename defaults to the name of the path or file.
+        :param chunk_size: number of bytes read from a file at a time"""
+        self.chunk_size = chunk_size
+        self.boundary = boundary or uuid.uuid4().hex
+
+        # Each part is ('data', bytes), ('path', path) or ('file', file)
+        self._parts = []
+        self._length = 0
+
+        for name, value in fields:
+            self._add_data(self._header(name) + b'\r\n' +
+                    text_type(value).encode('utf-8') + b'\r\n')
+
+        for name, file, filename in files:
+            if filename is None:
+                filename = os.path.basename(
+                        file if isinstance(file, string_types)
+                        else getattr(file, 'name', name))
+
+            content_type = (mimetypes.guess_type(filename)[0] or
+                    'application/octet-stream')
+            self._add_data(self._header(name, filename) +
+                    'Content-Type: {0}\r\n\r\n'.format(content_type).encode('utf-8'))
+
+            if isinstance(file, string_types):
+                self._parts.append(('path', file))
+                self._length += os.path.getsize(file)
+            else:
+                self._parts.append(('file', file))
+                self._length += self._remaining(file)
+
+            self._add_data(b'\r\n')
+
+        self._add_data('--{0}--\r\n'.format(self.boundary).encode('utf-8'))
+
+        # The current part, and how far through it we are
+        self._index = 0
+        self._offset = 0
+        self._file = None
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={0}'.format(self.boundary)
+
+    def _header(self, name, filename=None):
+        disposition = 'form-data; name="{0}"'.format(_quote(name))
+        if filename is not None:
+            disposition += '; filename="{0}"'.format(_quote(filename))
+
+        return '--{0}\r\nContent-Disposition: {1}\r\n'.format(
+                self.boundary, disposition).encode('utf-8')
+
+    def _add_data(self, data):
+        self._parts.append(('data', data))
+        self._length += len(data)
+
+    def _remaining(self, file):
+        position = file.tell()
+        file.seek(0, os.SEEK_END)
+        end = file.tell()
+        file.seek(position)
+        return end - position
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b'')
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b''.join(iter(self))
+
+        chunks = []
+        while size > 0 and self._index < len(self._parts):
+            chunk = self._read_part(size)
+            if chunk:
+                chunks.append(chunk)
+                size -= len(chunk)
+            else:
+                self._next_part()
+
+        return b''.join(chunks)
+
+    def _read_part(self, size):
+        kind, value = self._parts[self._index]
+
+        if kind == 'data':
+            chunk = value[self._offset:self._offset + size]
+            self._offset += len(chunk)
+            return chunk
+
+        if self._file is None:
+            # Paths are only opened when they're reached, so a bulk upload
+            # doesn't hold every file open at once
+            self._file = open(value, 'rb') if kind == 'path' else value
+
+        return self._file.read(size)
+
+    def _next_part(self):
+        kind = self._parts[self._index][0]
+        if kind == 'path' and self._file is not None:
+            self._file.close()
+
+        self._index += 1
+        self._offset = 0
+        self._file = None
+
+    def close(self):
+        """Close the file being read, if it was opened from a path"""
+        if self._file is not None and self._parts[self._index][0] == 'path':
+            self._file.close()
+        self._file = None
+
+
+def _quote(value):
+    # Quotes and line breaks would end the header value early
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\r', ' ').replace('\n', ' '))
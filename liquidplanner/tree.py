@@ -0,0 +1,160 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TreeIndex(object):
+    """An index of tree items, with constant time lookups by id and of the
+    children of an item.
+
+    Built from the nested results of treeitems.all(depth=...) or
+    treeitems.get(id, depth=...), where each item lists its children, or
+    from a flat list of items linked by parent_id."""
+
+    # Numeric fields totalled by rollup() by default
+    ROLLUP_FIELDS = ('low_effort_remaining', 'high_effort_remaining', 'work')
+
+    def __init__(self, items):
+        """
+        :param items: a tree item or list of tree items"""
+        if isinstance(items, dict):
+            items = [items]
+
+        # id -> item
+        self.nodes = {}
+
+        # id -> parent id, and parent id -> [child ids]
+        self.parents = {}
+        self.children = {}
+
+        # Every id, in the order the items were found
+        self.ids = []
+
+        stack = [(item, item.get('parent_id')) for item in reversed(items)]
+        while stack:
+            item, parent_id = stack.pop()
+            id = item['id']
+
+            self.nodes[id] = item
+            self.parents[id] = parent_id
+            self.children.setdefault(parent_id, []).append(id)
+            self.ids.append(id)
+
+            for child in reversed(item.get('children') or []):
+                stack.append((child, id))
+
+        # id -> position in ids
+        self.positions = dict((id, i) for i, id in enumerate(self.ids))
+
+    def _depths(self):
+        """Depth of each item below the top of the index, in ids order"""
+        depths = {}
+        for id in self.ids:
+            chain = []
+            while id in self.nodes and id not in depths:
+                chain.append(id)
+                id = self.parents[id]
+
+            depth = depths.get(id, -1)
+            for id in reversed(chain):
+                depth += 1
+                depths[id] = depth
+
+        return [depths[id] for id in self.ids]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        return id in self.nodes
+
+    def __getitem__(self, id):
+        return self.nodes[id]
+
+    def get_children(self, id):
+        """The items directly below an item"""
+        return [self.nodes[child] for child in self.children.get(id, [])]
+
+    def ancestors(self, id):
+        """The items above an item, starting with its parent"""
+        ancestors = []
+        parent_id = self.parents.get(id)
+        while parent_id in self.nodes:
+            ancestors.append(self.nodes[parent_id])
+            parent_id = self.parents[parent_id]
+        return ancestors
+
+    def path(self, id):
+        """The items from the top of the tree down to (and including) an item"""
+        return list(reversed(self.ancestors(id))) + [self.nodes[id]]
+
+    def descendants(self, id):
+        """Every item below an item"""
+        result = []
+        stack = list(reversed(self.children.get(id, [])))
+        while stack:
+            child = stack.pop()
+            result.append(self.nodes[child])
+            stack.extend(reversed(self.children.get(child, [])))
+        return result
+
+    def rollup(self, fields=ROLLUP_FIELDS):
+        """Total numeric fields over the leaf items below every item, and
+        count how many of those leaves are done and not done. Requires
+        numpy.
+
+        Only leaf items (e.g. tasks) are counted, as the values of items
+        with children already include their children's.
+
+        :param fields: names of the numeric fields to total"""
+        if numpy is None:
+            raise ImportError("numpy is required for rollups")
+
+        count = len(self.ids)
+        fields = tuple(fields)
+
+        parents = numpy.array(
+                [self.positions.get(self.parents[id], -1) for id in self.ids],
+                dtype=numpy.intp)
+        depths = numpy.array(self._depths(), dtype=numpy.intp)
+        leaves = numpy.array(
+                [id not in self.children for id in self.ids], dtype=bool)
+        done = numpy.array(
+                [bool(self.nodes[id].get('is_done')) for id in self.ids], dtype=bool)
+
+        # One column per field, then the done and undone counts
+        totals = numpy.zeros((count, len(fields) + 2))
+        for column, field in enumerate(fields):
+            totals[:, column] = [self.nodes[id].get(field) or 0 for id in self.ids]
+        totals[:, -2] = done
+        totals[:, -1] = ~done
+        totals[~leaves] = 0
+
+        # Add each level into the one above, starting from the bottom
+        for depth in range(int(depths.max()) if count else 0, 0, -1):
+            rows = numpy.nonzero((depths == depth) & (parents >= 0))[0]
+            numpy.add.at(totals, parents[rows], totals[rows])
+
+        return Rollup(self, fields + ('done', 'undone'), totals)
+
+
+class Rollup(object):
+    """Totals for every item in a TreeIndex, see TreeIndex.rollup()"""
+
+    def __init__(self, index, fields, totals):
+        self.index = index
+        self.fields = fields
+
+        # numpy array with a row for each of index.ids, and a column for
+        # each of fields
+        self.totals = totals
+
+    def __getitem__(self, id):
+        """Totals for one item, as a dict of field name to value"""
+        row = self.totals[self.index.positions[id]]
+        return dict((field, row[i].item()) for i, field in enumerate(self.fields))
+
+    def column(self, field):
+        """numpy array of one field for every item, in index.ids order"""
+        return self.totals[:, self.fields.index(field)]
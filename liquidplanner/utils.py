@@ -1,5 +1,12 @@
+import codecs
+import datetime
+import json
+import re
 from datetime import timedelta, tzinfo
 
+from six import iteritems
+from six.moves.urllib.parse import urlencode
+
 ZERO = timedelta(0)
 
 # A UTC class.
@@ -14,3 +21,141 @@ class UTC(tzinfo):
 
     def dst(self, dt):
         return ZERO
+
+
+def json_default(obj):
+    """Encode dates when serializing to JSON"""
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    return obj
+
+
+def underscore(name):
+    """Convert a type name from the API (e.g. 'TimesheetEntry') to the form
+    used in urls and fields (e.g. 'timesheet_entry')"""
+    return re.sub(r'([a-z0-9])([A-Z])', r'\1_\2', name).lower()
+
+
+def request_key(url, params=None):
+    """A string identifying a GET request, which doesn't depend on the
+    order of params"""
+    if not params:
+        return url
+
+    pairs = []
+    for name, value in sorted(iteritems(params)):
+        if isinstance(value, (list, tuple)):
+            pairs.extend((name, v) for v in value)
+        else:
+            pairs.append((name, value))
+
+    return url + '?' + urlencode(pairs)
+
+
+def map_concurrently(func, items, max_workers, catch=()):
+    """Call func for each of items using a pool of threads.
+
+    Results are returned in the same order as items. Any of the exception
+    types in catch raised by func are returned in place of its result,
+    rather than being raised."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def call(item):
+        try:
+            return func(item)
+        except catch as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(call, items))
+
+
+def iter_json_array(chunks):
+    """Decode a JSON array incrementally from an iterable of UTF-8 encoded
+    byte strings, yielding each element as soon as it has been received."""
+    decoder = JSONArrayDecoder()
+
+    for chunk in chunks:
+        for value in decoder.feed(chunk):
+            yield value
+        if decoder.done:
+            return
+
+    for value in decoder.feed(b'', final=True):
+        yield value
+
+
+class JSONArrayDecoder(object):
+    """Decodes a JSON array incrementally, from UTF-8 encoded byte strings
+    fed to it as they are received (e.g. by iter_json_array())."""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+
+        # What comes next: the opening '[', the first element (or ']'),
+        # an element, or the ',' (or ']') following an element
+        self._state = 'start'
+
+        # Set once the closing ']' has been decoded
+        self.done = False
+
+    def feed(self, chunk, final=False):
+        """Add a chunk, and return the list of elements it completed
+
+        :param final: True if this is the last chunk (which may be empty)
+        :raises ValueError: if the input isn't a JSON array"""
+        buf = self._buf + self._utf8.decode(chunk, final)
+        pos = 0
+        values = []
+
+        while not self.done:
+            while pos < len(buf) and buf[pos] in ' \t\n\r':
+                pos += 1
+
+            if pos >= len(buf):
+                break
+
+            char = buf[pos]
+
+            if self._state == 'start':
+                if char != '[':
+                    raise ValueError("Expected a JSON array")
+                pos += 1
+                self._state = 'first'
+                continue
+
+            if char == ']' and self._state in ('first', 'separator'):
+                self.done = True
+                break
+
+            if self._state == 'separator':
+                if char != ',':
+                    raise ValueError("Expected ',' or ']' at {0}".format(pos))
+                pos += 1
+                self._state = 'element'
+                continue
+
+            try:
+                value, end = self._decoder.raw_decode(buf, pos)
+            except ValueError:
+                end = None
+
+            # A number or literal that ends with the buffer may be cut short
+            if end is not None and (end < len(buf) or final or
+                    buf[end - 1] in '}]"'):
+                values.append(value)
+                pos = end
+                self._state = 'separator'
+                continue
+
+            # Need more data to continue
+            break
+
+        self._buf = buf[pos:]
+
+        if final and not self.done:
+            raise ValueError("Incomplete JSON array")
+
+        return values
@@ -0,0 +1,219 @@
+import binascii
+import hmac
+import json
+import logging
+import os
+import threading
+
+from six import text_type
+from six.moves import queue
+from six.moves.urllib.parse import parse_qs, urlencode
+
+from .utils import underscore
+
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookReceiver(object):
+    """Receives LiquidPlanner's webhook deliveries, and brings a response
+    cache and workspace mirror up to date with the changes they describe,
+    so neither needs to poll for changes.
+
+    It's a WSGI application, so can be served by any WSGI server, and
+    aio.serve_webhooks() serves it with asyncio:
+
+        receiver = WebhookReceiver(lp, mirror=mirror)
+        receiver.register('https://example.com/liquidplanner')
+        wsgiref.simple_server.make_server('', 8080, receiver).serve_forever()
+
+    Each delivery is a JSON event, or list of events, with the 'type' (e.g.
+    'Task'), 'id' and 'change_type' of a changed entity, as in the
+    workspace's list of changes.
+
+    Deliveries are acknowledged as soon as they have been checked, and
+    handled in order by a background thread, so a slow mirror or callback
+    doesn't make LiquidPlanner time out and deliver them again."""
+
+    # Query parameter and header that may carry the token
+    TOKEN_PARAM = 'token'
+    TOKEN_HEADER = 'X-Webhook-Token'
+
+    def __init__(self, lp, token=None, cache=None, mirror=None, callbacks=(),
+            background=True):
+        """
+        :param lp: the LiquidPlanner API, with its workspace_id set
+        :param token: secret that deliveries must include, generated if
+            not given
+        :param cache: ResponseCache to invalidate, by default lp.cache
+        :param mirror: WorkspaceMirror to update
+        :param callbacks: functions called with the list of events from
+            each delivery
+        :param background: handle deliveries in a background thread. If
+            False they are handled before responding, which must finish
+            within LiquidPlanner's delivery timeout."""
+        self.lp = lp
+        self.token = token or binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.cache = cache if cache is not None else getattr(lp, 'cache', None)
+        self.mirror = mirror
+        self.callbacks = list(callbacks)
+        self.background = background
+
+        # Deliveries waiting for the background thread, which is started
+        # by the first one
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        # The webhook created by register()
+        self.webhook = None
+
+        # singular type (e.g. 'timesheet_entry') -> manager name
+        self._type_names = dict((getattr(lp, manager[0]).singular, manager[0])
+                for manager in lp.MANAGERS)
+
+    def register(self, url, **fields):
+        """Create a webhook that delivers to url, with the token added to
+        its query string
+
+        :param url: public URL this receiver is served at
+        :param fields: other fields for the webhook"""
+        separator = '&' if '?' in url else '?'
+        fields['url'] = url + separator + urlencode(
+                {self.TOKEN_PARAM: self.token})
+
+        self.webhook = self.lp.webhooks.create(fields)
+        return self.webhook
+
+    def unregister(self):
+        """Delete the webhook created by register()"""
+        if self.webhook is not None:
+            self.lp.webhooks.delete(self.webhook['id'])
+            self.webhook = None
+
+    def verify(self, token):
+        """Whether a delivery's token is ours, compared in constant time"""
+        if not token:
+            return False
+
+        if isinstance(token, text_type):
+            token = token.encode('utf-8')
+
+        return hmac.compare_digest(token, self.token.encode('utf-8'))
+
+    def parse(self, body):
+        """The list of events in a delivery's body
+
+        :raises ValueError: if the body isn't a JSON event or list of them"""
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+
+        events = json.loads(body)
+        if isinstance(events, dict):
+            events = [events]
+
+        if not isinstance(events, list) or not all(
+                isinstance(event, dict) for event in events):
+            raise ValueError("Not a list of events")
+
+        return events
+
+    def handle(self, events):
+        """Apply events to the cache and mirror, then pass them on to the
+        callbacks"""
+        if self.cache is not None:
+            for event in events:
+                self.cache.invalidate(self._url(event))
+
+        if self.mirror is not None:
+            self.mirror.apply(events)
+
+        for callback in self.callbacks:
+            callback(events)
+
+    def join(self):
+        """Wait until every delivery received so far has been handled"""
+        self._queue.join()
+
+    def _enqueue(self, events):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work,
+                        name='WebhookReceiver')
+                self._worker.daemon = True
+                self._worker.start()
+
+        self._queue.put(events)
+
+    def _work(self):
+        while True:
+            events = self._queue.get()
+            try:
+                self.handle(events)
+            except Exception:
+                logger.exception("Failed to handle webhook events %r", events)
+            finally:
+                self._queue.task_done()
+
+    def _url(self, event):
+        """The url of the entity an event is about, or of the whole
+        workspace if the type isn't known"""
+        workspace_id = event.get('workspace_id') or self.lp.workspace_id
+        url = '/workspaces/{0}'.format(workspace_id)
+
+        name = self._type_names.get(underscore(event.get('type') or ''))
+        if name is not None:
+            url += '/' + name
+            if event.get('id') is not None:
+                url += '/' + str(event['id'])
+
+        return url
+
+    def receive(self, method, query_string, headers, body):
+        """Handle one HTTP request, returning the status code to respond
+        with. Used by both the WSGI and asyncio servers.
+
+        :param headers: a function returning the value of a header, or None"""
+        if method != 'POST':
+            return 405
+
+        token = (parse_qs(query_string or '').get(self.TOKEN_PARAM, [None])[0]
+                or headers(self.TOKEN_HEADER))
+        if not self.verify(token):
+            return 403
+
+        try:
+            events = self.parse(body)
+        except ValueError:
+            return 400
+
+        if self.background:
+            self._enqueue(events)
+        else:
+            self.handle(events)
+        return 204
+
+    def __call__(self, environ, start_response):
+        """The WSGI application"""
+        def headers(name):
+            return environ.get('HTTP_' + name.upper().replace('-', '_'))
+
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = environ['wsgi.input'].read(length) if length else b''
+
+        status = self.receive(environ['REQUEST_METHOD'],
+                environ.get('QUERY_STRING'), headers, body)
+
+        start_response(STATUSES[status], [('Content-Length', '0')])
+        return [b'']
+
+
+STATUSES = {
+    204: '204 No Content',
+    400: '400 Bad Request',
+    403: '403 Forbidden',
+    405: '405 Method Not Allowed',
+}
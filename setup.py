@@ -33,10 +33,15 @@ setup(
     install_requires=[
         'requests>=2.7.0',
         'python-dateutil>=2.4.2',
+        'futures>=3.0; python_version < "3.0"',
     ],
+    extras_require={
+        'async': ['aiohttp>=3.0'],
+        'numpy': ['numpy'],
+    },
     tests_require=[
         'mock',
     ],
     license='MIT',
-    test_suite='tests',
+    test_suite='tests.suite',
 )
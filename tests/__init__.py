@@ -0,0 +1,21 @@
+import os
+import sys
+
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+def suite():
+    """Every test module, except the asyncio client's tests before Python
+    3.7, which it needs (and older versions can't parse async code)"""
+    names = sorted(name[:-3] for name in os.listdir(os.path.dirname(__file__))
+            if name.endswith('.py') and name != '__init__.py')
+
+    if sys.version_info < (3, 7):
+        names.remove('aio')
+
+    return unittest.defaultTestLoader.loadTestsFromNames(
+            'tests.' + name for name in names)
@@ -0,0 +1,380 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+from mock import patch, Mock, ANY
+
+try:
+    from liquidplanner.aio import (AsyncLiquidPlanner, AsyncModel,
+            webhook_application)
+except ImportError:
+    AsyncLiquidPlanner = None
+from liquidplanner.auth import BasicCredentials
+from liquidplanner.cache import ResponseCache
+from liquidplanner.exceptions import *
+from liquidplanner.throttle import RetryPolicy
+
+
+class FakeContent(object):
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+
+class FakeResponse(object):
+    def __init__(self, status, body, headers=None):
+        self.status = status
+        self.headers = {'content-type': 'application/json'}
+        self.headers.update(headers or {})
+        self.charset = 'utf-8'
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.body = body
+        self.content = FakeContent(body)
+        self.released = False
+
+    async def read(self):
+        return self.body
+
+    def release(self):
+        self.released = True
+
+    def __await__(self):
+        # As the result of session.request()
+        yield from []
+        return self
+
+
+def create_client(*responses):
+    lp = AsyncLiquidPlanner(BasicCredentials('a@b.com', 'pw'),
+            use_first_workspace=False)
+    lp.workspace_id = 1
+
+    session = Mock()
+    session.request.side_effect = [FakeResponse(*r) for r in responses]
+    lp._get_session = Mock(return_value=session)
+
+    return lp, session
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+@unittest.skipIf(AsyncLiquidPlanner is None, "aiohttp is not installed")
+class AsyncTest(unittest.TestCase):
+    def test_all(self):
+        "Check that all() can be awaited"
+        lp, session = create_client((200, [{"id": 1}, {"id": 2}]))
+
+        results = run(lp.tasks.all(filters=['is_done is false'], limit=5))
+
+        self.assertEqual([r["id"] for r in results], [1, 2])
+        self.assertTrue(isinstance(results[0], AsyncModel))
+        self.assertEqual(results[1].uri, '/workspaces/1/tasks/2')
+        session.request.assert_called_with('GET',
+                'https://app.liquidplanner.com/api/workspaces/1/tasks',
+                data=None, headers=None, auth=ANY, timeout=ANY,
+                params=ANY)
+        params = session.request.call_args[1]['params']
+        self.assertTrue(('filter[]', 'is_done is false') in params)
+        self.assertTrue(('limit', '5') in params)
+
+    def test_create(self):
+        "Check that create() sends the wrapped JSON body"
+        lp, session = create_client((201, {"id": 7, "name": "Trevor"}))
+
+        result = run(lp.clients.create({"name": "Trevor"}))
+
+        self.assertEqual(result.uri, '/workspaces/1/clients/7')
+        self.assertEqual(session.request.call_args[1]['data'],
+                json.dumps({"client": {"name": "Trevor"}}))
+
+    def test_error(self):
+        "Check that error responses raise the usual exceptions"
+        lp, session = create_client((404, {"error": "NotFound", "message": ""}))
+
+        with self.assertRaises(LiquidPlannerNotFound):
+            run(lp.tasks.get(1))
+
+    def test_associations(self):
+        "Check that associated objects and convenience methods are async"
+        lp, session = create_client(
+                (200, {"id": 5}), (200, [{"id": 9}]), (200, {"id": 5}))
+
+        async def go():
+            task = await lp.tasks.get(5)
+            comments = await task.comments.all()
+            await task.track_time({"work": 1})
+            return comments
+
+        comments = run(go())
+
+        self.assertEqual(comments[0].uri, '/workspaces/1/tasks/5/comments/9')
+        session.request.assert_called_with('POST',
+                'https://app.liquidplanner.com/api/workspaces/1/tasks/5/track_time',
+                data='{"work": 1}', headers=None, auth=ANY, timeout=ANY,
+                params=None)
+
+    def test_first_workspace(self):
+        "Check that the first workspace is selected on entry"
+        lp, session = create_client((200, [{"id": 123}]))
+        lp.workspace_id = None
+        lp.use_first_workspace = True
+        lp.close = Mock(side_effect=lambda: asyncio.sleep(0))
+
+        async def go():
+            async with lp:
+                return lp.workspace_id
+
+        self.assertEqual(run(go()), 123)
+
+    def test_webhooks(self):
+        "Check that webhook deliveries are passed to the receiver"
+        from aiohttp.test_utils import TestClient, TestServer
+
+        receiver = Mock(receive=Mock(return_value=204))
+
+        async def go():
+            client = TestClient(TestServer(webhook_application(receiver, '/hook')))
+            await client.start_server()
+            try:
+                response = await client.post('/hook?token=secret', data=b'[]')
+                return response.status
+            finally:
+                await client.close()
+
+        self.assertEqual(run(go()), 204)
+        receiver.receive.assert_called_with('POST', 'token=secret', ANY, b'[]')
+
+    def test_get_many(self):
+        "Check that get_many() awaits each request and reports errors"
+        lp, session = create_client((200, {"id": 1}),
+                (404, {"error": "NotFound", "message": ""}), (200, {"id": 3}))
+
+        results = run(lp.tasks.get_many([1, 2, 3], max_workers=2))
+
+        self.assertEqual(results[0]["id"], 1)
+        self.assertTrue(isinstance(results[1], LiquidPlannerNotFound))
+        self.assertEqual(results[2]["id"], 3)
+        self.assertEqual(session.request.call_count, 3)
+
+    def test_bulk_changes(self):
+        "Check that create_many(), update_many() and delete_many() are async"
+        lp, session = create_client((201, {"id": 1}),
+                (422, {"error": "Invalid", "message": ""}), (200, {"id": 1}),
+                (200, {"id": 1}))
+
+        async def go():
+            created = await lp.clients.create_many([{"name": "A"}, {}])
+            updated = await lp.clients.update_many([(1, {"name": "B"})])
+            deleted = await lp.clients.delete_many([1])
+            return created, updated, deleted
+
+        created, updated, deleted = run(go())
+
+        self.assertEqual(created[0].uri, '/workspaces/1/clients/1')
+        self.assertTrue(isinstance(created[1], LiquidPlannerUnprocessableEntity))
+        self.assertEqual(updated[0]["id"], 1)
+        self.assertEqual(deleted[0]["id"], 1)
+        self.assertEqual([c[0][0] for c in session.request.call_args_list],
+                ['POST', 'POST', 'PUT', 'DELETE'])
+
+    def test_compact(self):
+        "Check that all(compact=True) can be awaited"
+        lp, session = create_client((200, [{"id": 1}, {"id": 2}]))
+
+        results = run(lp.tasks.all(compact=True))
+
+        self.assertEqual(results.column("id"), [1, 2])
+
+    def test_all_partitioned(self):
+        "Check that all_partitioned() awaits each partition"
+        lp, session = create_client(
+                (200, [{"id": 1}, {"id": 2}]), (200, [{"id": 2}, {"id": 3}]))
+
+        results = run(lp.tasks.all_partitioned(
+                [['project_id = 1'], ['project_id = 2']]))
+
+        self.assertEqual([r["id"] for r in results], [1, 2, 3])
+        self.assertEqual(session.request.call_count, 2)
+
+    def test_all_partitioned_count(self):
+        "Check that a number of partitions is split by updated_at"
+        lp, session = create_client(
+                (200, [{"id": 1, "updated_at": "2016-01-01T00:00:00+00:00"}]),
+                (200, [{"id": 1}]), (200, [{"id": 2}]))
+
+        results = run(lp.tasks.all_partitioned(2, max_workers=1))
+
+        self.assertEqual([r["id"] for r in results], [1, 2])
+        self.assertTrue(('limit', '1') in
+                session.request.call_args_list[0][1]['params'])
+
+    def test_retry(self):
+        "Check that the rate limiter and retry policy are used"
+        lp, session = create_client(
+                (503, {"error": "ServiceUnavailable", "message": ""}),
+                (200, [{"id": 1}]))
+        lp.rate_limiter = Mock(try_acquire=Mock(return_value=0))
+        lp.retry = RetryPolicy(max_retries=1, backoff=0)
+
+        results = run(lp.tasks.all())
+
+        self.assertEqual(results[0]["id"], 1)
+        self.assertEqual(session.request.call_count, 2)
+        self.assertEqual(lp.rate_limiter.try_acquire.call_count, 2)
+
+    def test_unsupported_options(self):
+        "Check that options that would block the event loop are refused"
+        lp, session = create_client()
+        lp.cache = ResponseCache()
+
+        with self.assertRaises(ValueError):
+            run(lp.tasks.all())
+        self.assertFalse(session.request.called)
+
+    def test_listeners(self):
+        "Check that async requests are measured"
+        lp, session = create_client((200, [{"id": 1}]), (200, [{"id": 2}]))
+        listener = Mock()
+        lp.listeners.append(listener)
+
+        async def go():
+            await lp.tasks.all()
+            return [task async for task in lp.tasks.iter_all()]
+
+        run(go())
+
+        requested, streamed = [c[0][0] for c in listener.call_args_list]
+        self.assertEqual(requested.status, 200)
+        self.assertEqual(requested.endpoint, '/workspaces/{workspace_id}/tasks')
+        self.assertEqual(requested.response_size, len(b'[{"id": 1}]'))
+        self.assertTrue(requested.decode_time is not None)
+        self.assertEqual(streamed.response_size, len(b'[{"id": 2}]'))
+        self.assertTrue(streamed.total_time is not None)
+
+    def test_fan_out(self):
+        "Check that fan_out queries every workspace with the shared session"
+        lp, session = create_client(
+                (200, [{"id": 1}, {"id": 2}]),
+                (200, [{"id": 10}]),
+                (404, {"message": "not found"}))
+        del lp._get_session
+        session.closed = False
+        lp.session = session
+
+        async def projects(client):
+            # One workspace at a time, so the responses arrive in order
+            return await client.projects.all()
+
+        results = run(lp.fan_out(projects, max_workers=1))
+
+        self.assertEqual(list(results), [1, 2])
+        self.assertEqual(results[1][0]['id'], 10)
+        self.assertTrue(isinstance(results[2], LiquidPlannerNotFound))
+        urls = [c[0][1] for c in session.request.call_args_list]
+        self.assertTrue(urls[0].endswith('/workspaces'))
+        self.assertTrue(urls[1].endswith('/workspaces/1/projects'))
+        self.assertTrue(urls[2].endswith('/workspaces/2/projects'))
+
+        clone = lp.for_workspace(3)
+        run(clone.close())
+        self.assertFalse(session.close.called)
+        self.assertTrue(clone._get_session() is session)
+
+    def test_upload(self):
+        "Check that a file is streamed as a multipart body"
+        lp, session = create_client()
+        bodies = []
+
+        async def request(method, url, data=None, **kwargs):
+            bodies.append(b''.join([chunk async for chunk in data]))
+            return FakeResponse(201, {"id": len(bodies)})
+
+        session.request.side_effect = request
+
+        document = run(lp.documents.upload(io.BytesIO(b'plan'),
+                filename='plan.txt', chunk_size=3))
+        results = run(lp.documents.upload_many(
+                [(io.BytesIO(b'a')), io.BytesIO(b'b')], max_workers=1))
+
+        self.assertEqual(document.uri, '/workspaces/1/documents/1')
+        self.assertEqual([r['id'] for r in results], [2, 3])
+        headers = session.request.call_args_list[0][1]['headers']
+        self.assertEqual(int(headers['Content-Length']), len(bodies[0]))
+        self.assertTrue(headers['Content-Type'].startswith('multipart/form-data'))
+        self.assertTrue(b'filename="plan.txt"' in bodies[0])
+        self.assertTrue(b'\r\n\r\nplan\r\n' in bodies[0])
+
+    def test_download(self):
+        "Check that documents are streamed to a file once they arrive"
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'plan.txt')
+        with open(path, 'wb') as f:
+            f.write(b'old')
+
+        lp, session = create_client(
+                (404, {"error": "NotFound", "message": ""}),
+                (200, b'abcdef', {'Content-Length': '6'}),
+                (200, b'thumb'))
+        document = AsyncModel(lp.documents, {"id": 3},
+                '/workspaces/1/documents/3')
+        progress = Mock()
+
+        with self.assertRaises(LiquidPlannerNotFound):
+            run(document.download_to(path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'old')
+
+        size = run(document.download_to(path, chunk_size=4, progress=progress))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'abcdef')
+        self.assertEqual(size, 6)
+        progress.assert_called_with(6, 6)
+
+        thumbnail = io.BytesIO()
+        run(document.thumbnail_to(thumbnail))
+        self.assertEqual(thumbnail.getvalue(), b'thumb')
+        self.assertTrue(session.request.call_args[0][1].endswith(
+                '/documents/3/thumbnail'))
+
+    def test_iter_all(self):
+        "Check that iter_all() streams records asynchronously"
+        lp, session = create_client((200, [{"id": 1}, {"id": 2}, {"id": 3}]))
+
+        async def go():
+            return [task async for task in lp.tasks.iter_all(chunk_size=4)]
+
+        results = run(go())
+
+        self.assertEqual([r["id"] for r in results], [1, 2, 3])
+        self.assertEqual(results[2].uri, '/workspaces/1/tasks/3')
+
+    def test_iter_all_error(self):
+        "Check that iter_all() raises the usual exceptions"
+        lp, session = create_client((404, {"error": "NotFound", "message": ""}))
+
+        async def go():
+            return [task async for task in lp.tasks.iter_all()]
+
+        with self.assertRaises(LiquidPlannerNotFound):
+            run(go())
@@ -9,6 +9,7 @@ import json
 from mock import patch, Mock, ANY
 
 from liquidplanner import LiquidPlanner
+from liquidplanner.exceptions import LiquidPlannerUnauthorized
 
 
 class ApiTest(unittest.TestCase):
@@ -22,12 +23,108 @@ class ApiTest(unittest.TestCase):
         credentials = Mock(auth=None)
         lp = LiquidPlanner(credentials)
 
-        self.assertTrue(mock_all.called)
+        # The workspace is looked up when it's first needed
+        self.assertFalse(mock_all.called)
+        self.assertTrue(lp.workspace_id == expected_output[0]["id"])
         self.assertTrue(lp.workspace_id == expected_output[0]["id"])
+        self.assertEqual(mock_all.call_count, 1)
 
         mock_all.reset_mock()
         mock_all.return_value = expected_output
         lp = LiquidPlanner(credentials, use_first_workspace=False)
 
+        self.assertTrue(lp.workspace_id is None)
+        self.assertFalse(mock_all.called)
+
+
+    def test_session(self):
+        "Check that the client owns a pooled session for all managers"
+        credentials = Mock(auth=None)
+        lp = LiquidPlanner(credentials, use_first_workspace=False,
+                pool_maxsize=25, max_retries=3)
+
+        adapter = lp.session.get_adapter('https://app.liquidplanner.com/api')
+        self.assertEqual(adapter._pool_maxsize, 25)
+        self.assertEqual(adapter.max_retries.total, 3)
+        self.assertEqual(lp.session.headers['X-API-Version'], '3.0.0')
+        self.assertTrue('gzip' in lp.session.headers['Accept-Encoding'])
+        self.assertTrue(lp.tasks.config.session is lp.projects.config.session)
+
+    @patch('liquidplanner.api.Manager.all')
+    def test_given_workspace(self, mock_all):
+        "Check that a workspace id can be given or set in the environment"
+        credentials = Mock(auth=None)
+
+        lp = LiquidPlanner(credentials, workspace_id=5)
+        self.assertEqual(lp.workspace_id, 5)
+
+        with patch.dict('os.environ', {'LP_WORKSPACE_ID': '7'}):
+            lp = LiquidPlanner(credentials)
+        self.assertEqual(lp.workspace_id, 7)
+
         self.assertFalse(mock_all.called)
 
+    def test_lazy_managers(self):
+        "Check that managers are created when first used"
+        lp = LiquidPlanner(Mock(auth=None), use_first_workspace=False)
+
+        self.assertFalse('tasks' in vars(lp))
+        self.assertTrue(lp.tasks is lp.tasks)
+        self.assertEqual(lp.tasks.url, '/workspaces/{workspace_id}/tasks')
+
+        with self.assertRaises(AttributeError):
+            lp.not_a_manager
+
+    def test_base_url(self):
+        "Check that managers use the given base url"
+        lp = LiquidPlanner(Mock(auth=None), use_first_workspace=False)
+        self.assertEqual(lp.tasks.base_url, "https://app.liquidplanner.com/api")
+
+        lp = LiquidPlanner(Mock(auth=None), use_first_workspace=False,
+                base_url="http://localhost:8000/api")
+        self.assertEqual(lp.tasks.base_url, "http://localhost:8000/api")
+
+    def test_timeout(self):
+        "Check that managers use the given timeout"
+        lp = LiquidPlanner(Mock(auth=None), use_first_workspace=False,
+                timeout=60)
+        self.assertEqual(lp.tasks.timeout, 60)
+
+    def test_for_workspace(self):
+        "Check that a copy for another workspace shares the session"
+        lp = LiquidPlanner(Mock(auth=None), workspace_id=1, cache=Mock())
+        lp.tasks
+
+        other = lp.for_workspace(2)
+
+        self.assertEqual(other.workspace_id, 2)
+        self.assertEqual(other.tasks._format_url(other.tasks.url),
+                '/workspaces/2/tasks')
+        self.assertEqual(lp.tasks._format_url(lp.tasks.url),
+                '/workspaces/1/tasks')
+        self.assertTrue(other.session is lp.session)
+        self.assertTrue(other.cache is lp.cache)
+
+    @patch('liquidplanner.api.Manager.all')
+    def test_fan_out(self, mock_all):
+        "Check that a query is run for every workspace"
+        mock_all.return_value = [{"id": 1}, {"id": 2}, {"id": 3}]
+        lp = LiquidPlanner(Mock(auth=None), workspace_id=1)
+
+        def query(client):
+            if client.workspace_id == 2:
+                raise LiquidPlannerUnauthorized(None, "failed")
+            if client.workspace_id == 4:
+                raise KeyError("bug")
+            return client.workspace_id * 10
+
+        results = lp.fan_out(query)
+
+        self.assertEqual(list(results), [1, 2, 3])
+        self.assertEqual(results[1], 10)
+        self.assertTrue(isinstance(results[2], LiquidPlannerUnauthorized))
+        self.assertEqual(lp.fan_out(query, workspace_ids=[3]), {3: 30})
+
+        # Bugs in the query aren't hidden
+        with self.assertRaises(KeyError):
+            lp.fan_out(query, workspace_ids=[3, 4])
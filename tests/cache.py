@@ -0,0 +1,90 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from mock import patch
+
+from liquidplanner.cache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_key(self):
+        "Check that keys don't depend on parameter order"
+        cache = ResponseCache()
+
+        self.assertEqual(cache.key('/a'), '/a')
+        self.assertEqual(
+            cache.key('/a', {'limit': 5, 'filter[]': ['x', 'y']}),
+            cache.key('/a', {'filter[]': ['x', 'y'], 'limit': 5}))
+
+    def test_lru(self):
+        "Check that the least recently used entry is evicted"
+        cache = ResponseCache(max_entries=2)
+        cache.set('/a', 'tasks', '1')
+        cache.set('/b', 'tasks', '2')
+        cache.get('/a')
+        cache.set('/c', 'tasks', '3')
+
+        self.assertEqual(len(cache), 2)
+        self.assertTrue(cache.get('/b') is None)
+        self.assertEqual(cache.get('/a').text, '1')
+
+    @patch('liquidplanner.cache.time.time')
+    def test_ttls(self, mock_time):
+        "Check that entries expire according to their type"
+        mock_time.return_value = 1000
+        cache = ResponseCache(ttl=10, ttls={'members': 300})
+        cache.set('/m', 'members', '[]')
+        cache.set('/t', 'tasks', '[]', etag='"abc"')
+
+        mock_time.return_value = 1100
+        self.assertTrue(cache.get('/m').is_fresh())
+        self.assertFalse(cache.get('/t').is_fresh())
+        self.assertEqual(cache.get('/t').validators(), {'If-None-Match': '"abc"'})
+        self.assertEqual(cache.get('/m').validators(), None)
+
+        cache.refresh('/t', 'tasks')
+        self.assertTrue(cache.get('/t').is_fresh())
+
+    def test_invalidate(self):
+        "Check that changes drop the affected entries only"
+        cache = ResponseCache()
+        for url in ['/workspaces/1/tasks', '/workspaces/1/tasks/5?include=note',
+                '/workspaces/1/treeitems/2', '/workspaces/1/comments',
+                '/workspaces/1/members', '/workspaces/12/tasks']:
+            cache.set(url, 'x', '{}')
+
+        cache.invalidate('/workspaces/1/tasks/5/comments')
+
+        self.assertEqual(sorted(cache._entries),
+                ['/workspaces/1/members', '/workspaces/12/tasks'])
+
+        cache.invalidate('/workspaces/1')
+        self.assertEqual(list(cache._entries), ['/workspaces/12/tasks'])
+
+    def test_track_time(self):
+        "Check that tracking time drops cached timesheet entries"
+        cache = ResponseCache()
+        for url in ['/workspaces/1/timesheet_entries?filter[]=x',
+                '/workspaces/1/timesheets/3', '/workspaces/1/members']:
+            cache.set(url, 'x', '{}')
+
+        cache.invalidate('/workspaces/1/tasks/5/track_time')
+
+        self.assertEqual(list(cache._entries), ['/workspaces/1/members'])
+
+    def test_generation(self):
+        "Check that responses from before a change aren't stored"
+        cache = ResponseCache()
+        generation = cache.generation
+
+        cache.invalidate('/workspaces/1/tasks/5')
+        cache.set('/workspaces/1/tasks/5', 'tasks', '{}', generation=generation)
+        self.assertTrue(cache.get('/workspaces/1/tasks/5') is None)
+
+        cache.set('/workspaces/1/tasks/5', 'tasks', '{}',
+                generation=cache.generation)
+        self.assertEqual(cache.get('/workspaces/1/tasks/5').text, '{}')
@@ -0,0 +1,61 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import datetime
+
+from dateutil.tz import tzoffset
+
+from liquidplanner.codec import JSONCodec, OrjsonCodec, fastest
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DATA = {
+    "name": u"café",
+    "started": datetime.datetime(2016, 1, 2, 3, 4, 5, tzinfo=tzoffset(None, -25200)),
+    "ids": [1, 2],
+}
+
+
+class JSONCodecTest(unittest.TestCase):
+    codec_class = JSONCodec
+
+    def setUp(self):
+        self.codec = self.codec_class()
+
+    def test_dates(self):
+        "Check that dates are encoded as ISO 8601 strings"
+        encoded = self.codec.dumps(DATA)
+        if not isinstance(encoded, bytes):
+            encoded = encoded.encode('utf-8')
+
+        self.assertTrue(b'"2016-01-02T03:04:05-07:00"' in encoded)
+
+    def test_loads(self):
+        "Check that bytes and text are decoded"
+        expected = {"name": u"café", "ids": [1, 2]}
+        self.assertEqual(self.codec.loads(u'{"name": "café", "ids": [1, 2]}'),
+                expected)
+        self.assertEqual(self.codec.loads(
+                u'{"name": "café", "ids": [1, 2]}'.encode('utf-8')), expected)
+
+
+@unittest.skipIf(orjson is None, "orjson is not installed")
+class OrjsonCodecTest(JSONCodecTest):
+    codec_class = OrjsonCodec
+
+    def test_same_encoding(self):
+        "Check that the encoding matches the json module's"
+        self.assertEqual(JSONCodec().loads(self.codec.dumps(DATA)),
+                JSONCodec().loads(JSONCodec().dumps(DATA)))
+
+    def test_fastest(self):
+        "Check that orjson is used when it's installed"
+        self.assertTrue(isinstance(fastest(), OrjsonCodec))
@@ -0,0 +1,61 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import threading
+import time
+
+from liquidplanner.flight import SingleFlight
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_shared_result(self):
+        "Check that concurrent calls with the same key run once"
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return "result"
+
+        run_threads(5, lambda: results.append(flight.do('key', slow)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 5)
+
+        # Once finished, the next call runs again
+        flight.do('key', slow)
+        self.assertEqual(len(calls), 2)
+
+    def test_shared_error(self):
+        "Check that waiting calls get the same exception"
+        flight = SingleFlight()
+        errors = []
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError("bad")
+
+        def target():
+            try:
+                flight.do('key', fail)
+            except ValueError as e:
+                errors.append(e)
+
+        run_threads(3, target)
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(len(set(id(e) for e in errors)), 1)
@@ -0,0 +1,109 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import gc
+from mock import Mock
+
+from liquidplanner import LiquidPlanner
+from liquidplanner.identity import IdentityMap
+from liquidplanner.results import ResultSet
+
+
+def create_client():
+    return LiquidPlanner(Mock(auth=None), workspace_id=1, identity_map=True)
+
+
+class IdentityMapTest(unittest.TestCase):
+    def test_shared(self):
+        "Check that the same entity from different managers is one Model"
+        lp = create_client()
+
+        task = lp.tasks._parse_data({"id": 5, "type": "Task", "name": "a"},
+                '/workspaces/1/tasks/5')
+        items = lp.treeitems._parse_data([{"id": 5, "type": "Task",
+                "name": "b", "updated_at": "2016-01-01T00:00:00+00:00"}],
+                '/workspaces/1/treeitems')
+
+        self.assertTrue(items[0] is task)
+        self.assertEqual(task["name"], "b")
+        self.assertEqual(task["updated_at"].year, 2016)
+        self.assertTrue(lp.identity_map.get('Task', 5) is task)
+
+    def test_types(self):
+        "Check that entities of different types don't clash"
+        lp = create_client()
+
+        task = lp.tasks._parse_data({"id": 5, "type": "Task"}, '/t/5')
+        member = lp.members._parse_data({"id": 5}, '/m/5')
+
+        self.assertFalse(task is member)
+        self.assertTrue(lp.identity_map.get('member', 5) is member)
+
+    def test_included(self):
+        "Check that included entities are shared"
+        lp = create_client()
+
+        comment = lp.comments._parse_data({"id": 9, "type": "Comment",
+                "comment": "old"}, '/workspaces/1/comments/9')
+        task = lp.tasks._parse_data({"id": 5, "type": "Task", "comments": [
+                {"id": 9, "type": "Comment", "comment": "new"}]},
+                '/workspaces/1/tasks/5')
+
+        self.assertTrue(task["comments"][0] is comment)
+        self.assertEqual(comment["comment"], "new")
+        self.assertEqual(comment.uri, '/workspaces/1/comments/9')
+
+    def test_type_names(self):
+        "Check that API types and manager names give the same key"
+        lp = create_client()
+
+        first = lp.timesheet_entries._parse_data({"id": 3}, '/te/3')
+        second = lp.timesheet_entries._parse_data(
+                {"id": 3, "type": "TimesheetEntry"}, '/te/3')
+
+        self.assertTrue(first is second)
+        self.assertTrue(lp.identity_map.get('TimesheetEntry', 3) is first)
+
+    def test_removed_fields(self):
+        "Check that fields missing from a newer copy are dropped"
+        lp = create_client()
+
+        task = lp.tasks._parse_data({"id": 5, "type": "Task", "note": "x"},
+                '/t/5')
+        lp.tasks._parse_data({"id": 5, "type": "Task"}, '/t/5')
+
+        self.assertFalse("note" in task)
+
+    def test_result_set(self):
+        "Check that compact results share models too"
+        lp = create_client()
+
+        task = lp.tasks._parse_data({"id": 5, "type": "Task"}, '/t/5')
+        results = ResultSet(lp.tasks, '/t', [{"id": 5, "type": "Task",
+                "name": "a"}])
+
+        self.assertTrue(results[0] is task)
+        self.assertEqual(task["name"], "a")
+
+    def test_weak(self):
+        "Check that models nothing else uses are dropped"
+        lp = create_client()
+
+        lp.tasks._parse_data({"id": 5, "type": "Task"}, '/t/5')
+        gc.collect()
+
+        self.assertEqual(len(lp.identity_map), 0)
+
+    def test_disabled(self):
+        "Check that models aren't shared by default"
+        lp = LiquidPlanner(Mock(auth=None), workspace_id=1)
+
+        first = lp.tasks._parse_data({"id": 5}, '/t/5')
+        second = lp.tasks._parse_data({"id": 5}, '/t/5')
+
+        self.assertFalse(first is second)
+        self.assertTrue(lp.identity_map is None)
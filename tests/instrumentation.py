@@ -0,0 +1,85 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import json
+
+from liquidplanner.instrumentation import (EndpointStats, RequestMetrics,
+        endpoint_template, percentile)
+
+
+def create_metrics(method, url, total_time, **kwargs):
+    metrics = RequestMetrics(method, url)
+    metrics.status = 200
+    metrics.total_time = total_time
+    for name, value in kwargs.items():
+        setattr(metrics, name, value)
+    return metrics
+
+
+class InstrumentationTest(unittest.TestCase):
+    def test_endpoint_template(self):
+        "Check that ids are replaced with placeholders"
+        self.assertEqual(endpoint_template('/workspaces/12/tasks/345/comments'),
+                '/workspaces/{workspace_id}/tasks/{id}/comments')
+        self.assertEqual(endpoint_template('/workspaces'), '/workspaces')
+        self.assertEqual(endpoint_template('/account'), '/account')
+
+    def test_percentile(self):
+        "Check nearest rank percentiles"
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 50), 51)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([], 50), None)
+
+    def test_endpoint_stats(self):
+        "Check that metrics are aggregated by method and endpoint"
+        stats = EndpointStats()
+        stats(create_metrics('get', '/workspaces/1/tasks/1', 0.02,
+                response_size=100))
+        stats(create_metrics('get', '/workspaces/1/tasks/2', 0.3,
+                response_size=50, retries=2))
+        stats(create_metrics('put', '/workspaces/1/tasks/2', 0.1,
+                error=ValueError()))
+        stats(create_metrics('get', '/workspaces/1/tasks/3', 0.02,
+                coalesced=True))
+
+        result = stats.export()
+        self.assertEqual(set(result), set([
+            'GET /workspaces/{workspace_id}/tasks/{id}',
+            'PUT /workspaces/{workspace_id}/tasks/{id}',
+        ]))
+
+        gets = result['GET /workspaces/{workspace_id}/tasks/{id}']
+        self.assertEqual(gets['count'], 3)
+        self.assertEqual(gets['coalesced'], 1)
+        self.assertEqual(gets['errors'], 0)
+        self.assertEqual(gets['retries'], 2)
+        self.assertEqual(gets['response_bytes'], 150)
+        self.assertEqual(gets['histogram']['0.025'], 2)
+        self.assertEqual(gets['histogram']['0.5'], 1)
+        self.assertEqual(gets['times']['total_time']['p99'], 0.3)
+        self.assertFalse('decode_time' in gets['times'])
+
+        puts = result['PUT /workspaces/{workspace_id}/tasks/{id}']
+        self.assertEqual(puts['errors'], 1)
+
+        # The export can be serialized
+        json.loads(stats.to_json())
+
+        stats.reset()
+        self.assertEqual(stats.export(), {})
+
+    def test_samples(self):
+        "Check that only recent samples are used for percentiles"
+        stats = EndpointStats(samples=2)
+        for total_time in (5, 1, 2):
+            stats(create_metrics('get', '/workspaces', total_time))
+
+        times = stats.export()['GET /workspaces']['times']['total_time']
+        self.assertEqual(times['p99'], 2)
+        self.assertEqual(times['mean'], 1.5)
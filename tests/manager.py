@@ -6,19 +6,27 @@ except ImportError:
 
 
 import datetime
+import io
 import json
+import threading
+import time
 from mock import patch, Mock, ANY
 
 from liquidplanner import LiquidPlanner
 from liquidplanner.exceptions import *
 from liquidplanner.manager import Manager
+from liquidplanner.results import ResultSet
+from liquidplanner.cache import ResponseCache
+from liquidplanner.throttle import RetryPolicy
+from liquidplanner.flight import SingleFlight
+from liquidplanner.transfer import MultipartStream
+from requests.exceptions import ConnectionError
 from liquidplanner.utils import UTC
 
 
 def create_client_manager():
-    config = Mock(
-        workspace_id=1,
-        credentials=Mock(auth=None))
+    config = LiquidPlanner(Mock(auth=None), use_first_workspace=False)
+    config.workspace_id = 1
 
     return Manager(config, 'clients', '/workspaces/{workspace_id}/clients')
 
@@ -31,6 +39,7 @@ def create_success_response(status_code, body):
         status_code=status_code,
         headers={'content-type': 'application/json'},
         text=json.dumps(body),
+        content=json.dumps(body).encode('utf-8'),
         json=return_body
     )
 
@@ -48,7 +57,7 @@ def create_error_response(status_code, title, message):
 
 
 class ManagerTest(unittest.TestCase):
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_bad_request(self, r_get):
         "Check that 400 responses are handled correctly"
         r_get.return_value = create_error_response(400, "BadRequest", "Bad Request")
@@ -60,7 +69,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_unauthorized(self, r_get):
         "Check that 401 responses are handled correctly"
         r_get.return_value = create_error_response(401, "Unauthorized", "Not authorized")
@@ -72,7 +81,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_unprocessable(self, r_get):
         "Check that 422 responses are handled correctly"
         r_get.return_value = create_error_response(422, 
@@ -85,7 +94,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_not_found(self, r_get):
         "Check that 404 responses are handled correctly"
         r_get.return_value = create_error_response(404, 
@@ -98,7 +107,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_internal_error(self, r_get):
         "Check that 500 responses are handled correctly"
         r_get.return_value = create_error_response(500, 
@@ -111,7 +120,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_not_implemented(self, r_get):
         "Check that 501 responses are handled correctly"
         r_get.return_value = create_error_response(501, 
@@ -124,7 +133,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_unavailable(self, r_get):
         "Check that 503 responses are handled correctly"
         r_get.return_value = create_error_response(503, 
@@ -137,7 +146,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_strange_response_code(self, r_get):
         "Check that unexpected response codes are handled correctly"
         r_get.return_value = create_error_response(299, 
@@ -150,7 +159,7 @@ class ManagerTest(unittest.TestCase):
 
         self.assertTrue(r_get.called)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_all(self, r_get):
         "Check that all() runs ok"
         expected_output = [{"id": 1}, {"id": 2}] 
@@ -164,7 +173,7 @@ class ManagerTest(unittest.TestCase):
         self.assertTrue(len(results) == len(expected_output))
         self.assertTrue(results[0]["id"] == expected_output[0]["id"])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_get(self, r_get):
         "Check that get() runs ok"
         expected_output = {"id": 1, "name": "Trevor"}
@@ -176,7 +185,7 @@ class ManagerTest(unittest.TestCase):
         self.assertTrue(r_get.called)
         self.assertTrue(result["name"] == expected_output["name"])
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_create(self, r_post):
         "Check that create() runs ok"
         expected_output = {"id": 1, "name": "Trevor"}
@@ -190,7 +199,7 @@ class ManagerTest(unittest.TestCase):
         r_post.assert_called_with(ANY, data=json.dumps(expected_post),
                 auth=ANY, headers=ANY, timeout=ANY, params=ANY)
 
-    @patch('requests.put')
+    @patch('requests.Session.put')
     def test_update(self, r_put):
         "Check that update() runs ok"
         expected_output = {"id": 1, "name": "Trevor"}
@@ -206,7 +215,7 @@ class ManagerTest(unittest.TestCase):
         r_put.assert_called_with(ANY, data=json.dumps(expected_put),
                 auth=ANY, headers=ANY, timeout=ANY, params=ANY)
 
-    @patch('requests.put')
+    @patch('requests.Session.put')
     def test_date_encoding(self, r_put):
         """Check that dates are JSON encoded correctly"""
         obj = {"date": datetime.datetime(2015, 5, 2, 10, 0, 0, 0, tzinfo=UTC())}
@@ -219,7 +228,7 @@ class ManagerTest(unittest.TestCase):
         r_put.assert_called_with(ANY, data=expected_data,
                 auth=ANY, headers=ANY, timeout=ANY, params=ANY)
 
-    @patch('requests.delete')
+    @patch('requests.Session.delete')
     def test_delete(self, r_delete):
         "Check that delete() runs ok"
         expected_output = {}
@@ -246,3 +255,422 @@ class ManagerTest(unittest.TestCase):
 
         self.assertEqual(Manager({}, 'activities', '/').singular, "activity")
 
+
+    @patch('requests.Session.get')
+    def test_shared_session(self, r_get):
+        "Check that associated object managers reuse the client's session"
+        r_get.return_value = create_success_response(200, {"id": 1})
+        manager = create_client_manager()
+
+        model = manager.get(1)
+
+        self.assertTrue(model.comments.config.session is manager.config.session)
+
+    @patch('requests.Session.get')
+    def test_get_many(self, r_get):
+        "Check that get_many() keeps order and reports failures per id"
+        def respond(url, **kwargs):
+            id = int(url.rsplit('/', 1)[1])
+            if id == 2:
+                return create_error_response(404, "NotFound", "Cannot be found")
+            return create_success_response(200, {"id": id})
+
+        r_get.side_effect = respond
+        manager = create_client_manager()
+
+        results = manager.get_many([3, 2, 1], include=["comments"], max_workers=2)
+
+        self.assertEqual(r_get.call_count, 3)
+        self.assertEqual(results[0]["id"], 3)
+        self.assertTrue(isinstance(results[1], LiquidPlannerNotFound))
+        self.assertEqual(results[2]["id"], 1)
+        self.assertEqual(r_get.call_args[1]["params"], {"include": "comments"})
+
+    @patch('requests.Session.get')
+    def test_iter_all(self, r_get):
+        "Check that iter_all() streams records from the response"
+        body = json.dumps([{"id": 1}, {"id": 2}]).encode('utf-8')
+        response = create_success_response(200, None)
+        response.iter_content.return_value = [body[:5], body[5:]]
+        r_get.return_value = response
+        manager = create_client_manager()
+
+        results = manager.iter_all(filters=['is_done is false'])
+        self.assertFalse(r_get.called)
+
+        results = list(results)
+
+        r_get.assert_called_with(ANY, data=None, auth=ANY, headers=ANY,
+                timeout=ANY, params={"filter[]": ['is_done is false']}, stream=True)
+        self.assertEqual([r["id"] for r in results], [1, 2])
+        self.assertEqual(results[1].uri, '/workspaces/1/clients/2')
+        self.assertTrue(response.close.called)
+
+    @patch('requests.Session.get')
+    def test_iter_all_error(self, r_get):
+        "Check that iter_all() raises errors before yielding"
+        r_get.return_value = create_error_response(401, "Unauthorized", "Not authorized")
+        manager = create_client_manager()
+
+        with self.assertRaises(LiquidPlannerUnauthorized):
+            list(manager.iter_all())
+
+    @patch('requests.Session.get')
+    def test_all_compact(self, r_get):
+        "Check that all() can return a compact ResultSet"
+        r_get.return_value = create_success_response(200, [{"id": 1}, {"id": 2}])
+        manager = create_client_manager()
+
+        results = manager.all(compact=True)
+
+        self.assertTrue(isinstance(results, ResultSet))
+        self.assertEqual(results.column("id"), [1, 2])
+        self.assertEqual(results[1].uri, '/workspaces/1/clients/2')
+
+    @patch('requests.Session.put')
+    @patch('requests.Session.get')
+    def test_cache(self, r_get, r_put):
+        "Check that cached responses are reused until something changes"
+        r_get.return_value = create_success_response(200, [{"id": 1}])
+        r_put.return_value = create_success_response(200, {"id": 1})
+        manager = create_client_manager()
+        manager.config.cache = ResponseCache()
+
+        self.assertEqual(manager.all()[0]["id"], 1)
+        self.assertEqual(manager.all()[0]["id"], 1)
+        self.assertEqual(r_get.call_count, 1)
+
+        manager.update(1, {"name": "Trevor"})
+        manager.all()
+        self.assertEqual(r_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_cache_race(self, r_get):
+        "Check that a response finishing after a change isn't cached"
+        manager = create_client_manager()
+        manager.config.cache = ResponseCache()
+
+        def get(*args, **kwargs):
+            # Another thread changes a task while this request is made
+            manager.config.cache.invalidate('/workspaces/1/tasks/1')
+            return create_success_response(200, [{"id": 1}])
+        r_get.side_effect = get
+
+        manager.all()
+        manager.all()
+
+        self.assertEqual(r_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_cache_revalidate(self, r_get):
+        "Check that expired responses are revalidated with their ETag"
+        response = create_success_response(200, {"id": 1, "name": "Trevor"})
+        response.headers['ETag'] = '"v1"'
+        r_get.return_value = response
+        manager = create_client_manager()
+        manager.config.cache = ResponseCache(ttl=0)
+
+        manager.get(1)
+        r_get.return_value = Mock(status_code=304, headers={})
+        result = manager.get(1)
+
+        self.assertEqual(result["name"], "Trevor")
+        self.assertEqual(r_get.call_args[1]["headers"], {"If-None-Match": '"v1"'})
+
+    @patch('liquidplanner.manager.time.sleep')
+    @patch('requests.Session.get')
+    def test_retry(self, r_get, mock_sleep):
+        "Check that unavailable responses are retried with the retry policy"
+        unavailable = create_error_response(503, "ServiceUnavailable", "Busy")
+        unavailable.headers['Retry-After'] = '2'
+        r_get.side_effect = [unavailable, ConnectionError(),
+                create_success_response(200, [{"id": 1}])]
+        manager = create_client_manager()
+        manager.config.retry = RetryPolicy(max_retries=2)
+        manager.config.rate_limiter = Mock()
+
+        results = manager.all()
+
+        self.assertEqual(results[0]["id"], 1)
+        self.assertEqual(r_get.call_count, 3)
+        self.assertEqual(manager.config.rate_limiter.acquire.call_count, 3)
+        self.assertEqual(mock_sleep.call_args_list[0][0], (2,))
+
+    @patch('liquidplanner.manager.time.sleep')
+    @patch('requests.Session.post')
+    def test_no_retry_post(self, r_post, mock_sleep):
+        "Check that requests which aren't idempotent aren't retried"
+        r_post.return_value = create_error_response(503, "ServiceUnavailable", "Busy")
+        manager = create_client_manager()
+        manager.config.retry = RetryPolicy()
+
+        with self.assertRaises(LiquidPlannerUnavailable):
+            manager.create({"name": "Trevor"})
+
+        self.assertEqual(r_post.call_count, 1)
+
+    @patch('requests.Session.get')
+    def test_too_many_requests(self, r_get):
+        "Check that 429 responses are handled correctly"
+        r_get.return_value = create_error_response(429, "TooManyRequests", "Slow down")
+        manager = create_client_manager()
+
+        with self.assertRaises(LiquidPlannerTooManyRequests):
+            manager.all()
+
+    @patch('requests.Session.post')
+    def test_create_many(self, r_post):
+        "Check that create_many() keeps order and reports failures per record"
+        def respond(url, data=None, **kwargs):
+            name = json.loads(data)["client"]["name"]
+            if not name:
+                return create_error_response(422, "UnprocessableEntity", "Name required")
+            return create_success_response(201, {"id": len(name), "name": name})
+
+        r_post.side_effect = respond
+        manager = create_client_manager()
+
+        results = manager.create_many([{"name": "Trevor"}, {"name": ""}, {"name": "Al"}])
+
+        self.assertEqual(results[0]["name"], "Trevor")
+        self.assertTrue(isinstance(results[1], LiquidPlannerUnprocessableEntity))
+        self.assertEqual(results[2]["id"], 2)
+
+    @patch('requests.Session.put')
+    def test_update_many(self, r_put):
+        "Check that update_many() sends each update to its record"
+        r_put.return_value = create_success_response(200, {"id": 1})
+        manager = create_client_manager()
+
+        results = manager.update_many([(1, {"name": "A"}), (2, {"name": "B"})])
+
+        self.assertEqual(len(results), 2)
+        urls = sorted(call[0][0] for call in r_put.call_args_list)
+        self.assertTrue(urls[0].endswith('/workspaces/1/clients/1'))
+        self.assertTrue(urls[1].endswith('/workspaces/1/clients/2'))
+
+    @patch('requests.Session.delete')
+    def test_delete_many(self, r_delete):
+        "Check that delete_many() deletes every record"
+        r_delete.return_value = create_success_response(200, {})
+        manager = create_client_manager()
+
+        results = manager.delete_many([1, 2, 3], max_workers=2)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(r_delete.call_count, 3)
+
+    @patch('requests.Session.get')
+    def test_coalesce(self, r_get):
+        "Check that identical GETs in flight at once share one request"
+        def respond(*args, **kwargs):
+            time.sleep(0.1)
+            return create_success_response(200, [{"id": 1}])
+
+        r_get.side_effect = respond
+        manager = create_client_manager()
+        manager.config.single_flight = SingleFlight()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(manager.all()))
+                for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(r_get.call_count, 1)
+        self.assertEqual([r[0]["id"] for r in results], [1] * 4)
+        self.assertFalse(results[0][0] is results[1][0])
+
+    @patch('requests.Session.get')
+    def test_coalesce_listeners(self, r_get):
+        "Check that coalesced requests are measured with the shared timings"
+        def respond(*args, **kwargs):
+            time.sleep(0.1)
+            response = create_success_response(200, [{"id": 1}])
+            response.elapsed = datetime.timedelta(seconds=0.05)
+            return response
+
+        r_get.side_effect = respond
+        manager = create_client_manager()
+        manager.config.single_flight = SingleFlight()
+        listener = Mock()
+        manager.config.listeners = [listener]
+
+        threads = [threading.Thread(target=manager.all) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(r_get.call_count, 1)
+        metrics = [call[0][0] for call in listener.call_args_list]
+        self.assertEqual(sorted(m.coalesced for m in metrics),
+                [False, True, True])
+        for m in metrics:
+            self.assertEqual(m.status, 200)
+            self.assertEqual(m.wait_time, 0.05)
+            self.assertTrue(m.total_time is not None)
+            self.assertTrue(m.decode_time is not None)
+
+    @patch('requests.Session.get')
+    def test_listeners(self, r_get):
+        "Check that listeners are given the metrics of each request"
+        response = create_success_response(200, [{"id": 1}])
+        response.elapsed = datetime.timedelta(seconds=0.25)
+        r_get.return_value = response
+
+        manager = create_client_manager()
+        listener = Mock()
+        manager.config.listeners = [listener]
+        manager.get(5)
+
+        metrics = listener.call_args[0][0]
+        self.assertEqual(metrics.method, 'GET')
+        self.assertEqual(metrics.endpoint, '/workspaces/{workspace_id}/clients/{id}')
+        self.assertEqual(metrics.status, 200)
+        self.assertEqual(metrics.wait_time, 0.25)
+        self.assertEqual(metrics.response_size, len(response.content))
+        self.assertEqual(metrics.retries, 0)
+        self.assertTrue(metrics.decode_time is not None)
+        self.assertTrue(metrics.error is None)
+
+    @patch('requests.Session.get')
+    def test_listeners_streamed(self, r_get):
+        "Check that compact and streamed lists are measured"
+        body = json.dumps([{"id": 1}, {"id": 2}]).encode('utf-8')
+        response = create_success_response(200, [{"id": 1}, {"id": 2}])
+        response.elapsed = datetime.timedelta(seconds=0.25)
+        response.iter_content.return_value = [body[:5], body[5:]]
+        r_get.return_value = response
+
+        manager = create_client_manager()
+        listener = Mock()
+        manager.config.listeners = [listener]
+
+        manager.all(compact=True)
+        list(manager.iter_all())
+
+        compact, streamed = [c[0][0] for c in listener.call_args_list]
+        self.assertEqual(compact.endpoint, '/workspaces/{workspace_id}/clients')
+        self.assertEqual(compact.response_size, len(body))
+        self.assertTrue(compact.decode_time is not None)
+        self.assertEqual(streamed.status, 200)
+        self.assertEqual(streamed.response_size, len(body))
+        self.assertTrue(streamed.total_time >= streamed.download_time)
+
+    @patch('requests.Session.get')
+    def test_listeners_error(self, r_get):
+        "Check that listeners are told about failed requests"
+        response = create_error_response(404, "NotFound", "Not found")
+        response.elapsed = datetime.timedelta(seconds=0.1)
+        r_get.return_value = response
+
+        manager = create_client_manager()
+        listener = Mock()
+        manager.config.listeners = [listener]
+
+        with self.assertRaises(LiquidPlannerNotFound):
+            manager.get(5)
+
+        metrics = listener.call_args[0][0]
+        self.assertEqual(metrics.status, 404)
+        self.assertTrue(isinstance(metrics.error, LiquidPlannerNotFound))
+
+    @patch('requests.Session.post')
+    def test_upload(self, r_post):
+        "Check that upload() streams a multipart body"
+        r_post.return_value = create_success_response(201, {"id": 3})
+        manager = create_client_manager()
+        manager.singular = 'document'
+
+        result = manager.upload(io.BytesIO(b'data'), filename='plan.txt',
+                description='The plan')
+        self.assertEqual(result["id"], 3)
+
+        args, kwargs = r_post.call_args
+        body = kwargs['data']
+        self.assertTrue(isinstance(body, MultipartStream))
+        self.assertEqual(kwargs['headers'],
+                {'Content-Type': body.content_type})
+
+        data = body.read()
+        self.assertTrue(b'name="document[description]"\r\n\r\nThe plan' in data)
+        self.assertTrue(b'name="document[attached_file]"; filename="plan.txt"' in data)
+
+    @patch('requests.Session.get')
+    def test_all_partitioned(self, r_get):
+        "Check that partitions are fetched and duplicates merged"
+        def respond(url, params=None, **kwargs):
+            if 'owner_id = 1' in params['filter[]']:
+                return create_success_response(200, [
+                    {"id": 1, "updated_at": "2016-01-01T00:00:00+00:00"},
+                    {"id": 2, "updated_at": "2016-01-01T00:00:00+00:00"}])
+            return create_success_response(200, [
+                {"id": 2, "updated_at": "2016-01-02T00:00:00+00:00"},
+                {"id": 3, "updated_at": "2016-01-01T00:00:00+00:00"}])
+
+        r_get.side_effect = respond
+        manager = create_client_manager()
+
+        results = manager.all_partitioned([['owner_id = 1'], ['owner_id = 2']],
+                filters=['is_done is false'], max_workers=2)
+
+        self.assertEqual([r["id"] for r in results], [1, 2, 3])
+        self.assertEqual(results[1]["updated_at"].day, 2)
+        self.assertEqual(r_get.call_count, 2)
+        for call in r_get.call_args_list:
+            self.assertEqual(call[1]['params']['filter[]'][0], 'is_done is false')
+
+    @patch('requests.Session.get')
+    def test_all_partitioned_count(self, r_get):
+        "Check that a number of partitions is split by updated_at"
+        r_get.side_effect = [
+            create_success_response(200, [
+                {"id": 1, "updated_at": "2016-01-01T00:00:00+00:00"}]),
+            create_success_response(200, [{"id": 1}]),
+            create_success_response(200, [{"id": 2}]),
+            create_success_response(200, [{"id": 3}]),
+        ]
+        manager = create_client_manager()
+
+        results = manager.all_partitioned(3, filters=['is_done is false'],
+                max_workers=1)
+
+        self.assertEqual([r["id"] for r in results], [1, 2, 3])
+        oldest = r_get.call_args_list[0][1]['params']
+        self.assertEqual(oldest['order'], 'updated_at')
+        self.assertEqual(oldest['limit'], 1)
+
+        filters = [c[1]['params']['filter[]'] for c in r_get.call_args_list[1:]]
+        self.assertEqual(filters[0][0], 'is_done is false')
+        self.assertTrue(filters[0][1].startswith('updated_at before 2'))
+        self.assertTrue(filters[1][1].startswith('updated_at after 2'))
+        self.assertTrue(filters[1][2].startswith('updated_at before 2'))
+        self.assertEqual(len(filters[2]), 2)
+
+    @patch('requests.Session.get')
+    def test_all_partitioned_empty(self, r_get):
+        "Check that an empty list isn't partitioned"
+        r_get.return_value = create_success_response(200, [])
+        manager = create_client_manager()
+
+        self.assertEqual(manager.all_partitioned(4), [])
+        self.assertEqual(r_get.call_count, 2)
+        self.assertFalse(r_get.call_args[1]['params'].get('filter[]'))
+
+    @patch('requests.Session.post')
+    def test_codec(self, r_post):
+        "Check that the client's codec encodes and decodes bodies"
+        r_post.return_value = create_success_response(201, {"id": 1})
+        manager = create_client_manager()
+        manager.config.codec = Mock(dumps=Mock(return_value=b'{}'),
+                loads=Mock(return_value={"id": 2}))
+
+        result = manager.create({"name": "x"})
+
+        self.assertEqual(result["id"], 2)
+        manager.config.codec.dumps.assert_called_with({"client": {"name": "x"}})
+        manager.config.codec.loads.assert_called_with(b'{"id": 1}')
+        self.assertEqual(r_post.call_args[1]['data'], b'{}')
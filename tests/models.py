@@ -9,7 +9,9 @@ import json
 from mock import patch, Mock, ANY
 import datetime
 
-from liquidplanner.models import Model
+import dateutil.parser
+
+from liquidplanner.models import Model, parse_date
 
 
 class MockManager(object):
@@ -34,6 +36,34 @@ class ModelTest(unittest.TestCase):
         self.assertTrue(isinstance(model["other_date"], datetime.datetime))
         self.assertTrue(isinstance(model["nested"][0]["extra_date"], datetime.datetime))
 
+    def test_parse_date(self):
+        "Check that the fast date parser matches dateutil"
+        for value in ["2015-01-01T09:10:20+00:00", "2015-06-30T23:59:59-07:30",
+                "1999-12-31T00:00:00+10:00"]:
+            date = parse_date(value)
+            expected = dateutil.parser.parse(value)
+
+            self.assertEqual(date, expected)
+            self.assertEqual(date.utcoffset(), expected.utcoffset())
+
+        self.assertEqual(parse_date("2015-01-01"), None)
+        self.assertEqual(parse_date("2015-01-01T09:10:20+00:0x"), None)
+
+    def test_date_keys(self):
+        "Check that only the configured date keys are converted"
+        data = {
+                "created_at": "2015-01-01T09:10:20+00:00",
+                "name": "2015-01-01T09:10:20+00:00",
+                "nested": [{"created_at": "2015-01-10T00:00:01+00:00"}]}
+
+        manager = MockManager()
+        manager.config = Mock(date_keys=set(["created_at"]))
+        model = Model(manager, data, "/")
+
+        self.assertTrue(isinstance(model["created_at"], datetime.datetime))
+        self.assertFalse(isinstance(model["name"], datetime.datetime))
+        self.assertTrue(isinstance(model["nested"][0]["created_at"], datetime.datetime))
+
     def test_update_assignment(self):
         "Check that update_assignment() runs without error"
         data = {}
@@ -131,6 +161,16 @@ class ModelTest(unittest.TestCase):
 
         manager._make_request.assert_called_with('get', '/uri/1/download')
 
+    @patch('liquidplanner.models.download')
+    def test_download_to(self, download):
+        "Check that download_to() streams the document"
+        manager = MockManager()
+        model = Model(manager, {}, "/uri/1")
+        model.download_to('/tmp/file', chunk_size=10)
+
+        download.assert_called_with(manager, '/uri/1/download', '/tmp/file',
+                chunk_size=10)
+
     def test_track_time(self):
         "Check that track_time() runs without error"
         data = {}
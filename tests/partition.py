@@ -0,0 +1,40 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import datetime
+
+from liquidplanner import partition
+
+
+class PartitionTest(unittest.TestCase):
+    def test_by_updated_at(self):
+        "Check that windows cover all time and overlap at the boundaries"
+        partitions = partition.by_updated_at(datetime.datetime(2016, 1, 1),
+                datetime.datetime(2016, 1, 4), 3)
+
+        self.assertEqual(partitions, [
+            ['updated_at before 2016-01-02T00:00:01+00:00'],
+            ['updated_at after 2016-01-01T23:59:59+00:00',
+                'updated_at before 2016-01-03T00:00:01+00:00'],
+            ['updated_at after 2016-01-02T23:59:59+00:00'],
+        ])
+
+        self.assertEqual(partition.by_updated_at(datetime.datetime(2016, 1, 1),
+                datetime.datetime(2016, 1, 4), 1), [[]])
+
+        with self.assertRaises(ValueError):
+            partition.by_updated_at(datetime.datetime(2016, 1, 1),
+                    datetime.datetime(2016, 1, 4), 0)
+
+    def test_by_project(self):
+        "Check partitions by project id or project"
+        self.assertEqual(partition.by_project([1, {"id": 2}]),
+                [['project_id = 1'], ['project_id = 2']])
+
+    def test_by_parent(self):
+        "Check partitions by parent id"
+        self.assertEqual(partition.by_parent([3]), [['parent_id = 3']])
@@ -0,0 +1,121 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from mock import patch, Mock
+
+from liquidplanner import LiquidPlanner
+from liquidplanner.exceptions import LiquidPlannerNotFound
+from liquidplanner.models import Model
+from liquidplanner.prefetch import prefetch_related
+
+
+def create_tasks():
+    lp = LiquidPlanner(Mock(auth=None), workspace_id=1)
+    tasks = lp.tasks._parse_data([{"id": 1}, {"id": 2}], '/workspaces/1/tasks')
+    return lp, tasks
+
+
+def with_comments(id):
+    return {"id": id, "comments": [{"id": id * 10,
+            "created_at": "2016-01-01T00:00:00+00:00"}]}
+
+
+class PrefetchTest(unittest.TestCase):
+    def test_include(self):
+        "Check that associations are fetched with include, in batches"
+        lp, tasks = create_tasks()
+        lp.tasks.all = Mock(return_value=[with_comments(1), with_comments(2)])
+        lp.tasks.get_many = Mock()
+
+        prefetch_related(tasks, ['comments'], max_workers=2)
+
+        lp.tasks.all.assert_called_once_with(include=['comments'],
+                filters=['id = 1,2'])
+        self.assertFalse(lp.tasks.get_many.called)
+
+        comment = tasks[1]['comments'][0]
+        self.assertTrue(isinstance(comment, Model))
+        self.assertEqual(comment['id'], 20)
+        self.assertEqual(comment.uri, '/workspaces/1/tasks/2/comments/20')
+        self.assertEqual(comment['created_at'].year, 2016)
+
+    def test_whole_list(self):
+        "Check that the whole list can be fetched in one request"
+        lp, tasks = create_tasks()
+        lp.tasks.all = Mock(return_value=[with_comments(1), with_comments(2),
+                with_comments(3)])
+        lp.tasks.get_many = Mock()
+
+        prefetch_related(tasks, ['comments'], whole_list=True)
+
+        lp.tasks.all.assert_called_with(include=['comments'])
+        self.assertFalse(lp.tasks.get_many.called)
+        self.assertEqual(tasks[0]['comments'][0]['id'], 10)
+
+    def test_batches(self):
+        "Check that ids are split into batches, and missing models fetched"
+        lp, tasks = create_tasks()
+        lp.tasks.all = Mock(side_effect=[[with_comments(1)], []])
+        lp.tasks.get_many = Mock(return_value=[with_comments(2)])
+
+        prefetch_related(tasks, ['comments'], batch_size=1)
+
+        self.assertEqual([c[1]['filters'] for c in lp.tasks.all.call_args_list],
+                [['id = 1'], ['id = 2']])
+        lp.tasks.get_many.assert_called_with([2], include=['comments'],
+                max_workers=8)
+        self.assertEqual(tasks[1]['comments'][0]['id'], 20)
+
+    def test_duplicates(self):
+        "Check that models sharing an id are fetched once, in order"
+        lp, tasks = create_tasks()
+        tasks = [tasks[1], tasks[0], tasks[1]]
+        lp.tasks.all = Mock(return_value=[with_comments(1), with_comments(2)])
+
+        prefetch_related(tasks, ['comments'])
+
+        lp.tasks.all.assert_called_once_with(include=['comments'],
+                filters=['id = 2,1'])
+        self.assertEqual(tasks[2]['comments'][0]['id'], 20)
+
+    def test_single(self):
+        "Check that single record associations are stored as one Model"
+        lp, tasks = create_tasks()
+        lp.tasks.all = Mock(return_value=[
+                {"id": 1, "note": {"id": 3, "note": "x"}, "timer": {"id": 4}},
+                {"id": 2, "note": None, "timer": None}])
+
+        prefetch_related(tasks, ['note', 'timer'])
+
+        self.assertTrue(isinstance(tasks[0]['note'], Model))
+        self.assertEqual(tasks[0]['note']['note'], "x")
+        self.assertEqual(tasks[0]['note'].uri, '/workspaces/1/tasks/1/note')
+        self.assertEqual(tasks[0]['timer']['id'], 4)
+        self.assertTrue(tasks[1]['note'] is None)
+        self.assertTrue(tasks[1]['timer'] is None)
+
+    @patch('liquidplanner.manager.Manager.all')
+    def test_not_included(self, mock_all):
+        "Check that associations the API doesn't include are fetched"
+        lp, tasks = create_tasks()
+        mock_all.side_effect = [[{"id": 1}, {"id": 2}], ["estimate"],
+                ["estimate"]]
+
+        prefetch_related(tasks, ['estimates'])
+
+        self.assertEqual(tasks[0]['estimates'], ["estimate"])
+        self.assertEqual(mock_all.call_count, 3)
+
+    def test_error(self):
+        "Check that errors fetching a model are raised"
+        lp, tasks = create_tasks()
+        lp.tasks.all = Mock(return_value=[])
+        lp.tasks.get_many = Mock(return_value=[with_comments(1),
+                LiquidPlannerNotFound(None, "gone")])
+
+        with self.assertRaises(LiquidPlannerNotFound):
+            prefetch_related(tasks, ['comments'])
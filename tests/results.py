@@ -0,0 +1,52 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import datetime
+from mock import Mock
+
+from liquidplanner.manager import Manager
+from liquidplanner.models import Model
+from liquidplanner.results import ResultSet
+
+
+def create_result_set(records):
+    config = Mock(date_keys=None, identity_map=None)
+    manager = Manager(config, 'tasks', '/workspaces/1/tasks')
+    return ResultSet(manager, '/workspaces/1/tasks', records)
+
+
+class ResultSetTest(unittest.TestCase):
+    def test_models(self):
+        "Check that records are returned as Models on demand"
+        results = create_result_set([
+                {"id": 1, "name": "One"},
+                {"id": 2, "is_done": True, "updated_at": "2015-01-01T09:10:20+00:00"}])
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results.columns, ["id", "name", "is_done", "updated_at"])
+
+        first = results[0]
+        self.assertTrue(isinstance(first, Model))
+        self.assertEqual(first, {"id": 1, "name": "One"})
+        self.assertEqual(first.uri, '/workspaces/1/tasks/1')
+        self.assertEqual(first.comments.url, '/workspaces/1/tasks/1/comments')
+
+        last = results[-1]
+        self.assertFalse("name" in last)
+        self.assertTrue(isinstance(last["updated_at"], datetime.datetime))
+
+        self.assertEqual([m["id"] for m in results], [1, 2])
+        self.assertEqual([m["id"] for m in results[1:]], [2])
+
+    def test_column(self):
+        "Check that a single field can be read for every record"
+        results = create_result_set([{"id": 1}, {"id": 2, "owner_id": 5}])
+
+        self.assertEqual(results.column("id"), [1, 2])
+        self.assertEqual(results.column("owner_id"), [None, 5])
+        self.assertEqual(results.column("unknown", 0), [0, 0])
+        self.assertEqual(list(results.records()), [{"id": 1}, {"id": 2, "owner_id": 5}])
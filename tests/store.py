@@ -0,0 +1,78 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import datetime
+
+from liquidplanner.models import parse_date
+from liquidplanner.store import LocalStore
+
+
+class LocalStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = LocalStore()
+        self.store.save('tasks', [
+            {"id": 1, "parent_id": 10, "is_done": False, "name": "One",
+                "updated_at": parse_date("2015-01-02T00:00:00+00:00")},
+            {"id": 2, "parent_id": 10, "is_done": True, "name": "Two",
+                "updated_at": parse_date("2015-01-01T20:00:00-05:00")},
+            {"id": 3, "parent_id": 11, "is_done": False, "name": "Three"}])
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_get(self):
+        "Check that records are stored with their dates"
+        task = self.store.get('tasks', 2)
+
+        self.assertEqual(task["name"], "Two")
+        self.assertTrue(isinstance(task["updated_at"], datetime.datetime))
+        self.assertEqual(self.store.get('tasks', 99), None)
+        self.assertEqual(self.store.count('tasks'), 3)
+
+    def test_replace_and_delete(self):
+        "Check that saving again replaces, and records can be deleted"
+        self.store.save('tasks', {"id": 1, "name": "Renamed"})
+        self.store.delete('tasks', [3])
+
+        self.assertEqual(self.store.get('tasks', 1)["name"], "Renamed")
+        self.assertEqual(self.store.get('tasks', 3), None)
+
+    def test_filter(self):
+        "Check that records can be found by their indexed columns"
+        tasks = self.store.filter('tasks', parent_id=10, is_done=False)
+        self.assertEqual([t["id"] for t in tasks], [1])
+
+        with self.assertRaises(ValueError):
+            self.store.filter('tasks', project_id=5)
+
+    def test_query(self):
+        "Check that updated_at is ordered in UTC"
+        tasks = self.store.query('tasks', 'updated_at IS NOT NULL',
+                order_by='updated_at DESC', limit=1)
+
+        # 20:00 -05:00 is after midnight UTC
+        self.assertEqual(tasks[0]["id"], 2)
+
+    def test_query_dates(self):
+        "Check that datetimes in queries are compared as stored"
+        after = datetime.datetime(2015, 1, 1, 18, 0)
+        tasks = self.store.query('tasks', 'updated_at > ?', (after,),
+                order_by='id')
+        self.assertEqual([t["id"] for t in tasks], [1, 2])
+
+        after = parse_date("2015-01-01T20:30:00-05:00")
+        tasks = self.store.query('tasks', 'updated_at > ?', (after,))
+        self.assertEqual([t["id"] for t in tasks], [])
+
+        tasks = self.store.filter('tasks',
+                updated_at=parse_date("2015-01-02T01:00:00+00:00"))
+        self.assertEqual([t["id"] for t in tasks], [2])
+
+    def test_unknown_type(self):
+        "Check that only known entity types can be used"
+        with self.assertRaises(ValueError):
+            self.store.get('tasks; DROP TABLE tasks', 1)
@@ -0,0 +1,98 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from mock import patch, Mock
+
+from liquidplanner import LiquidPlanner
+from liquidplanner.exceptions import LiquidPlannerNotFound
+from liquidplanner.models import Model
+from liquidplanner.sync import WorkspaceMirror
+
+
+def create_mirror():
+    lp = LiquidPlanner(Mock(auth=None), use_first_workspace=False)
+    lp.workspace_id = 1
+
+    def model(manager, data):
+        return Model(manager, data, manager.url + "/" + str(data["id"]))
+
+    lp.tasks.all = Mock(return_value=[
+            model(lp.tasks, {"id": 1, "updated_at": "2015-01-01T00:00:00+00:00"}),
+            model(lp.tasks, {"id": 2, "updated_at": "2015-01-02T00:00:00+00:00"})])
+    lp.timesheet_entries.all = Mock(return_value=[])
+
+    return lp, WorkspaceMirror(lp, types=('tasks', 'timesheet_entries'))
+
+
+class WorkspaceMirrorTest(unittest.TestCase):
+    def test_full_sync(self):
+        "Check that the first sync fetches everything"
+        lp, mirror = create_mirror()
+
+        updated = mirror.sync()
+
+        self.assertEqual(updated, set([('tasks', 1), ('tasks', 2)]))
+        self.assertEqual(mirror.get('tasks', 2)["id"], 2)
+        self.assertEqual(mirror.cursor.isoformat(), '2015-01-02T00:00:00+00:00')
+
+    @patch('liquidplanner.models.Model.changes')
+    def test_delta_sync(self, mock_changes):
+        "Check that later syncs only fetch the changed entities"
+        lp, mirror = create_mirror()
+        mirror.sync()
+
+        mock_changes.return_value = [
+                {"type": "Task", "id": 1, "change_type": "update"},
+                {"type": "Task", "id": 2, "change_type": "delete"},
+                {"type": "TimesheetEntry", "id": 7, "change_type": "create"},
+                {"type": "Task", "id": 3, "change_type": "create"},
+                {"type": "Comment", "id": 9, "change_type": "create"}]
+
+        def get_many(ids, max_workers):
+            return [LiquidPlannerNotFound(None, "gone") if id == 3 else
+                    {"id": id, "name": "new"} for id in ids]
+
+        lp.tasks.get_many = Mock(side_effect=get_many)
+        lp.timesheet_entries.get_many = Mock(side_effect=get_many)
+
+        updated = mirror.sync()
+
+        mock_changes.assert_called_with({'since': '2015-01-02T00:00:00+00:00'})
+        self.assertEqual(updated, set([('tasks', 1), ('tasks', 2), ('tasks', 3),
+                ('timesheet_entries', 7)]))
+        self.assertEqual(mirror.get('tasks', 1)["name"], "new")
+        self.assertEqual(mirror.get('tasks', 2), None)
+        self.assertEqual(mirror.get('tasks', 3), None)
+        self.assertEqual(mirror.get('timesheet_entries', 7)["name"], "new")
+        self.assertEqual(lp.tasks.all.call_count, 1)
+
+    @patch('liquidplanner.models.Model.changes')
+    def test_failed_sync(self, mock_changes):
+        "Check that the cursor doesn't move if fetching fails"
+        lp, mirror = create_mirror()
+        mirror.sync()
+        cursor = mirror.cursor
+
+        mock_changes.return_value = [{"type": "Task", "id": 1, "change_type": "update"}]
+        lp.tasks.get_many = Mock(return_value=[IOError("timeout")])
+
+        with self.assertRaises(IOError):
+            mirror.sync()
+
+        self.assertEqual(mirror.cursor, cursor)
+
+    def test_apply(self):
+        "Check that changes can be applied without moving the cursor"
+        lp, mirror = create_mirror()
+        mirror.sync()
+        lp.tasks.get_many = Mock(return_value=[{"id": 1, "name": "new"}])
+
+        updated = mirror.apply([{"type": "Task", "id": 1, "change_type": "update"}])
+
+        self.assertEqual(updated, set([('tasks', 1)]))
+        self.assertEqual(mirror.get('tasks', 1)["name"], "new")
+        self.assertEqual(mirror.cursor.isoformat(), '2015-01-02T00:00:00+00:00')
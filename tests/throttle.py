@@ -0,0 +1,77 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from mock import patch, Mock
+
+from liquidplanner.throttle import RetryPolicy, TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+    @patch('liquidplanner.throttle.time.sleep')
+    @patch('liquidplanner.throttle.time.time')
+    def test_acquire(self, mock_time, mock_sleep):
+        "Check that requests wait once the burst capacity is used"
+        now = [100.0]
+        mock_time.side_effect = lambda: now[0]
+
+        def sleep(seconds):
+            now[0] += seconds
+        mock_sleep.side_effect = sleep
+
+        bucket = TokenBucket(rate=2, capacity=2)
+        for i in range(4):
+            bucket.acquire()
+
+        # Two requests in the burst, then one every half second
+        self.assertEqual(now[0], 101.0)
+
+    @patch('liquidplanner.throttle.time.time')
+    def test_try_acquire(self, mock_time):
+        "Check that try_acquire() returns how long to wait instead of waiting"
+        mock_time.return_value = 100.0
+        bucket = TokenBucket(rate=4, capacity=1)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0.25)
+
+    def test_rate(self):
+        "Check that the rate must be positive"
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_should_retry(self):
+        "Check that only idempotent methods and listed statuses are retried"
+        policy = RetryPolicy(max_retries=2)
+
+        self.assertTrue(policy.should_retry('get', 0, Mock(status_code=503)))
+        self.assertTrue(policy.should_retry('delete', 1, None))
+        self.assertFalse(policy.should_retry('get', 2, Mock(status_code=503)))
+        self.assertFalse(policy.should_retry('get', 0, Mock(status_code=404)))
+        self.assertFalse(policy.should_retry('post', 0, Mock(status_code=503)))
+
+    def test_delay(self):
+        "Check exponential backoff with jitter, capped at max_backoff"
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+
+        for attempt, limit in [(0, 1), (1, 2), (2, 4), (5, 5)]:
+            delay = policy.delay(attempt)
+            self.assertTrue(limit / 2.0 <= delay <= limit)
+
+    def test_retry_after(self):
+        "Check that Retry-After is honoured in seconds or as a date"
+        policy = RetryPolicy()
+
+        response = Mock(headers={'Retry-After': '7'})
+        self.assertEqual(policy.delay(0, response), 7)
+
+        response = Mock(headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(policy.delay(0, response), 0)
+
+        response = Mock(headers={'Retry-After': '86400'})
+        self.assertEqual(policy.delay(0, response), 30)
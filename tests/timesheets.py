@@ -0,0 +1,111 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import datetime
+import json
+from mock import patch, Mock
+
+from liquidplanner import LiquidPlanner
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    from liquidplanner.timesheets import TimesheetTable
+
+
+ENTRIES = [
+    {"id": 1, "member_id": 5, "item_id": 10, "project_id": 2,
+        "activity_id": 3, "work": 2.5, "work_performed_on": "2016-05-02"},
+    {"id": 2, "member_id": 5, "item_id": 11, "project_id": 2,
+        "activity_id": 3, "work": 1, "work_performed_on": "2016-05-08"},
+    {"id": 3, "member_id": 6, "item_id": 12, "project_id": 4,
+        "work": 4, "work_performed_on": "2016-05-09"},
+]
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TimesheetTableTest(unittest.TestCase):
+    def test_columns(self):
+        "Check that entries are converted into typed columns"
+        table = TimesheetTable.from_records(ENTRIES)
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table['member_id'].tolist(), [5, 5, 6])
+        self.assertEqual(table['activity_id'].tolist(), [3, 3, -1])
+        self.assertEqual(table['hours'].tolist(), [2.5, 1, 4])
+        self.assertEqual(table['day'].dtype, numpy.dtype('datetime64[D]'))
+
+        # Weeks start on Monday
+        self.assertEqual([str(week) for week in table['week']],
+                ['2016-05-02', '2016-05-02', '2016-05-09'])
+
+    def test_nested(self):
+        "Check that entries listed by timesheets are flattened"
+        table = TimesheetTable.from_records([{"id": 7, "member_id": 9,
+                "timesheet_entries": [{"id": 8, "work": 1}]}])
+
+        self.assertEqual(table['id'].tolist(), [8])
+        self.assertEqual(table['member_id'].tolist(), [9])
+        self.assertTrue(numpy.isnat(table['week'][0]))
+
+    def test_group_by(self):
+        "Check totals for each group"
+        table = TimesheetTable.from_records(ENTRIES)
+
+        members = table.by_member()
+        self.assertEqual(members['member_id'].tolist(), [5, 6])
+        self.assertEqual(members['hours'].tolist(), [3.5, 4])
+        self.assertEqual(members['count'].tolist(), [2, 1])
+
+        weeks = table.group_by('project_id', 'week')
+        self.assertEqual(weeks['project_id'].tolist(), [2, 4])
+        self.assertEqual(weeks['hours'].tolist(), [3.5, 4])
+
+        with self.assertRaises(ValueError):
+            table.group_by('note')
+
+    def test_between(self):
+        "Check filtering by date"
+        table = TimesheetTable.from_records(ENTRIES)
+
+        self.assertEqual(table.between('2016-05-03', '2016-05-09')['id'].tolist(), [2])
+        self.assertEqual(table.select(table['member_id'] == 6)['id'].tolist(), [3])
+
+    @patch('requests.Session.get')
+    def test_fetch(self, r_get):
+        "Check that entries are streamed into a table"
+        r_get.return_value = Mock(status_code=200,
+                iter_content=lambda size: [json.dumps(ENTRIES).encode('utf-8')])
+        lp = LiquidPlanner(Mock(auth=None), workspace_id=1)
+
+        table = TimesheetTable.fetch(lp.timesheet_entries,
+                filters=['work_performed_on >= 2016-05-01'])
+
+        self.assertEqual(table['id'].tolist(), [1, 2, 3])
+        self.assertEqual(r_get.call_args[1]['params'],
+                {'filter[]': ['work_performed_on >= 2016-05-01']})
+        self.assertTrue(r_get.call_args[1]['stream'])
+
+    @patch('requests.Session.get')
+    def test_fetch_listeners(self, r_get):
+        "Check that fetching a table is measured"
+        body = json.dumps(ENTRIES).encode('utf-8')
+        r_get.return_value = Mock(status_code=200,
+                elapsed=datetime.timedelta(seconds=0.1),
+                iter_content=lambda size: [body])
+        listener = Mock()
+        lp = LiquidPlanner(Mock(auth=None), workspace_id=1,
+                listeners=[listener])
+
+        TimesheetTable.fetch(lp.timesheet_entries)
+
+        metrics = listener.call_args[0][0]
+        self.assertEqual(metrics.endpoint,
+                '/workspaces/{workspace_id}/timesheet_entries')
+        self.assertEqual(metrics.response_size, len(body))
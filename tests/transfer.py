@@ -0,0 +1,274 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import io
+import os
+import shutil
+import tempfile
+from mock import Mock
+
+from requests.exceptions import ChunkedEncodingError
+
+from liquidplanner import LiquidPlanner
+from liquidplanner.exceptions import LiquidPlannerNotFound
+from liquidplanner.manager import Manager
+from liquidplanner.transfer import MultipartStream, download
+
+
+def create_manager(*responses):
+    config = LiquidPlanner(Mock(auth=None), use_first_workspace=False)
+    manager = Manager(config, 'documents', '/workspaces/1/documents')
+    manager._send = Mock(side_effect=responses)
+    return manager
+
+
+def create_response(status_code, chunks, headers=None, fail=False):
+    def iter_content(chunk_size):
+        for chunk in chunks:
+            yield chunk
+        if fail:
+            raise ChunkedEncodingError("Connection broken")
+
+    return Mock(status_code=status_code, headers=headers or {},
+            iter_content=iter_content)
+
+
+class DownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'download')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_download(self):
+        "Check that the body is written to a file object with progress"
+        manager = create_manager(create_response(200, [b'abc', b'def'],
+                {'Content-Length': '6'}))
+        progress = Mock()
+        dest = io.BytesIO()
+
+        self.assertEqual(download(manager, '/doc', dest, progress=progress), 6)
+
+        self.assertEqual(dest.getvalue(), b'abcdef')
+        manager._send.assert_called_with('get', '/doc',
+                headers={'Accept-Encoding': 'identity'}, metrics=None,
+                stream=True)
+        progress.assert_called_with(6, 6)
+
+    def test_resume_after_failure(self):
+        "Check that a broken download carries on with a Range request"
+        manager = create_manager(
+            create_response(200, [b'abc'], {'Content-Length': '6',
+                    'ETag': '"v1"'}, fail=True),
+            create_response(206, [b'def'], {'Content-Range': 'bytes 3-5/6'}),
+        )
+
+        self.assertEqual(download(manager, '/doc', self.path), 6)
+
+        self.assertEqual(self.read(), b'abcdef')
+        manager._send.assert_called_with('get', '/doc',
+                headers={'Accept-Encoding': 'identity', 'Range': 'bytes=3-',
+                    'If-Range': '"v1"'}, metrics=None, stream=True)
+
+    def test_listeners(self):
+        "Check that each download request is measured"
+        manager = create_manager(
+            create_response(200, [b'abc'], {'Content-Length': '6'}, fail=True),
+            create_response(206, [b'def'], {'Content-Range': 'bytes 3-5/6'}),
+        )
+        listener = Mock()
+        manager.config.listeners = [listener]
+
+        download(manager, '/doc', io.BytesIO())
+
+        metrics = [c[0][0] for c in listener.call_args_list]
+        self.assertEqual([m.response_size for m in metrics], [3, 3])
+        self.assertTrue(isinstance(metrics[0].error, ChunkedEncodingError))
+        self.assertTrue(metrics[1].error is None)
+
+    def test_resume_changed(self):
+        "Check that a resumed download fails if the body's length changed"
+        manager = create_manager(
+            create_response(200, [b'abc'], {'Content-Length': '6'}, fail=True),
+            create_response(206, [b'def'], {'Content-Range': 'bytes 3-5/9'}),
+        )
+
+        with self.assertRaises(ValueError):
+            download(manager, '/doc', self.path)
+
+    def test_resume_file(self):
+        "Check that an existing partial file is resumed"
+        with open(self.path, 'wb') as f:
+            f.write(b'abc')
+
+        manager = create_manager(
+            create_response(206, [b'def'], {'Content-Range': 'bytes 3-5/6'}))
+        download(manager, '/doc', self.path, resume=True)
+
+        self.assertEqual(self.read(), b'abcdef')
+
+    def test_existing_file(self):
+        "Check that an existing file is replaced unless resuming"
+        with open(self.path, 'wb') as f:
+            f.write(b'xxxxxxxx')
+
+        manager = create_manager(create_response(200, [b'abc']))
+        download(manager, '/doc', self.path)
+
+        self.assertEqual(self.read(), b'abc')
+
+    def test_range_not_satisfiable(self):
+        "Check that a file that isn't the start of the body is replaced"
+        with open(self.path, 'wb') as f:
+            f.write(b'xxxxxxxx')
+
+        manager = create_manager(
+            create_response(416, [], {'Content-Range': 'bytes */6'}),
+            create_response(200, [b'abcdef'], {'Content-Length': '6'}))
+        download(manager, '/doc', self.path, resume=True)
+
+        self.assertEqual(self.read(), b'abcdef')
+
+        # Unless it's the whole body
+        manager = create_manager(
+            create_response(416, [], {'Content-Range': 'bytes */6'}))
+        self.assertEqual(download(manager, '/doc', self.path, resume=True), 6)
+        self.assertEqual(self.read(), b'abcdef')
+
+    def test_range_ignored(self):
+        "Check that the file is replaced if the server sends the whole body"
+        with open(self.path, 'wb') as f:
+            f.write(b'xxxxxxxx')
+
+        manager = create_manager(create_response(200, [b'abcdef']))
+        download(manager, '/doc', self.path, resume=True)
+
+        self.assertEqual(self.read(), b'abcdef')
+
+    def test_mmap(self):
+        "Check that a download can be written through a memory map"
+        manager = create_manager(
+            create_response(200, [b'abc'], {'Content-Length': '6'}, fail=True),
+            create_response(206, [b'def'], {'Content-Range': 'bytes 3-5/6'}),
+        )
+
+        download(manager, '/doc', self.path, use_mmap=True)
+
+        self.assertEqual(self.read(), b'abcdef')
+
+    def test_mmap_encoded(self):
+        "Check that compressed bodies are streamed rather than mapped"
+        manager = create_manager(create_response(200, [b'abcdef'],
+                {'Content-Length': '3', 'Content-Encoding': 'gzip'}))
+        progress = Mock()
+
+        download(manager, '/doc', self.path, progress=progress, use_mmap=True)
+
+        self.assertEqual(self.read(), b'abcdef')
+        progress.assert_called_with(6, None)
+
+    def test_give_up(self):
+        "Check that the file is left ready to resume when retries run out"
+        manager = create_manager(
+            create_response(200, [b'abc'], {'Content-Length': '6'}, fail=True))
+
+        with self.assertRaises(ChunkedEncodingError):
+            download(manager, '/doc', self.path, use_mmap=True, max_resumes=0)
+
+        self.assertEqual(self.read(), b'abc')
+
+    def test_error(self):
+        "Check that error responses raise the matching exception"
+        manager = create_manager(create_response(404, [],
+                {'content-type': 'text/html'}))
+
+        with self.assertRaises(LiquidPlannerNotFound):
+            download(manager, '/doc', io.BytesIO())
+
+    def test_error_keeps_file(self):
+        "Check that an error response leaves an existing file as it was"
+        with open(self.path, 'wb') as f:
+            f.write(b'xxxxxxxx')
+
+        manager = create_manager(create_response(404, [],
+                {'content-type': 'text/html'}))
+
+        with self.assertRaises(LiquidPlannerNotFound):
+            download(manager, '/doc', self.path)
+        self.assertEqual(self.read(), b'xxxxxxxx')
+
+        # Nor is a missing one created
+        os.remove(self.path)
+        manager = create_manager(create_response(404, [],
+                {'content-type': 'text/html'}))
+        with self.assertRaises(LiquidPlannerNotFound):
+            download(manager, '/doc', self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_not_seekable(self):
+        "Check that a file that can't seek is written as the body arrives"
+        pipe = Mock(seekable=Mock(return_value=False), tell=Mock(
+                side_effect=IOError("Illegal seek")))
+        manager = create_manager(
+            create_response(200, [], fail=True),
+            create_response(200, [b'abc', b'def']))
+
+        self.assertEqual(download(manager, '/doc', pipe), 6)
+        self.assertEqual([c[0][0] for c in pipe.write.call_args_list],
+                [b'abc', b'def'])
+        self.assertFalse(pipe.seek.called)
+
+        # Once something has been written, it can't carry on
+        manager = create_manager(
+            create_response(200, [b'abc'], {'Content-Length': '6'}, fail=True))
+        with self.assertRaises(ChunkedEncodingError):
+            download(manager, '/doc', pipe)
+        self.assertEqual(manager._send.call_count, 1)
+
+
+class MultipartStreamTest(unittest.TestCase):
+    def test_body(self):
+        "Check the encoded fields and files"
+        stream = MultipartStream([('note', 'hi')],
+                [('file', io.BytesIO(b'data'), 'a "b".txt')], boundary='xyz')
+
+        body = stream.read()
+        self.assertEqual(body,
+            b'--xyz\r\nContent-Disposition: form-data; name="note"\r\n\r\n'
+            b'hi\r\n'
+            b'--xyz\r\nContent-Disposition: form-data; name="file"; '
+            b'filename="a \\"b\\".txt"\r\nContent-Type: text/plain\r\n\r\n'
+            b'data\r\n'
+            b'--xyz--\r\n')
+        self.assertEqual(len(stream), len(body))
+        self.assertEqual(stream.content_type,
+                'multipart/form-data; boundary=xyz')
+
+    def test_chunks(self):
+        "Check that a file is read from its path in chunks"
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'plan.bin')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 1000)
+
+            stream = MultipartStream(files=[('file', path, None)],
+                    chunk_size=64)
+            chunks = list(stream)
+
+            self.assertTrue(max(len(chunk) for chunk in chunks) <= 64)
+            body = b''.join(chunks)
+            self.assertEqual(len(stream), len(body))
+            self.assertTrue(b'filename="plan.bin"' in body)
+            self.assertTrue(b'x' * 1000 + b'\r\n--' in body)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,65 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+from liquidplanner.tree import TreeIndex
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def create_tree():
+    return [{
+        "id": 1, "type": "Project", "work": 9,
+        "children": [
+            {"id": 2, "type": "Folder", "children": [
+                {"id": 3, "type": "Task", "work": 2, "high_effort_remaining": 4,
+                    "is_done": False},
+                {"id": 4, "type": "Task", "work": 3, "is_done": True},
+            ]},
+            {"id": 5, "type": "Task", "work": 4, "high_effort_remaining": 1,
+                "is_done": False},
+        ]}, {
+        "id": 6, "type": "Project", "children": []}]
+
+
+class TreeIndexTest(unittest.TestCase):
+    def test_lookups(self):
+        "Check lookups by id, children, ancestors and descendants"
+        tree = TreeIndex(create_tree())
+
+        self.assertEqual(len(tree), 6)
+        self.assertEqual(tree[4]["work"], 3)
+        self.assertEqual([c["id"] for c in tree.get_children(1)], [2, 5])
+        self.assertEqual([a["id"] for a in tree.ancestors(3)], [2, 1])
+        self.assertEqual([p["id"] for p in tree.path(3)], [1, 2, 3])
+        self.assertEqual([d["id"] for d in tree.descendants(1)], [2, 3, 4, 5])
+        self.assertEqual(tree.get_children(6), [])
+
+    def test_flat_items(self):
+        "Check that parent_id links items listed without nesting"
+        tree = TreeIndex([{"id": 3, "parent_id": 2}, {"id": 2, "parent_id": 1},
+                {"id": 1}])
+
+        self.assertEqual([p["id"] for p in tree.path(3)], [1, 2, 3])
+
+        if numpy is not None:
+            tree.nodes[3]["work"] = 5
+            self.assertEqual(tree.rollup()[1]["work"], 5)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_rollup(self):
+        "Check that leaf values and done counts are totalled up the tree"
+        rollup = TreeIndex(create_tree()).rollup()
+
+        self.assertEqual(rollup[1], {"low_effort_remaining": 0,
+                "high_effort_remaining": 5, "work": 9, "done": 1, "undone": 2})
+        self.assertEqual(rollup[2]["work"], 5)
+        self.assertEqual(rollup[3]["undone"], 1)
+        self.assertEqual(rollup[6]["work"], 0)
+        self.assertEqual(list(rollup.column("done")), [1, 1, 0, 1, 0, 0])
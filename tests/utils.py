@@ -0,0 +1,54 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import json
+
+from liquidplanner.utils import iter_json_array, map_concurrently
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class UtilsTest(unittest.TestCase):
+    def test_iter_json_array(self):
+        "Check that arrays are decoded however the input is split up"
+        items = [{"id": 1, "name": "café [1]"}, {"id": 2, "tags": ["a", "b"]},
+                12345, "text, with comma", None, [1, [2]]]
+        data = json.dumps(items, ensure_ascii=False).encode('utf-8')
+
+        for size in [1, 2, 3, 7, 64, len(data)]:
+            self.assertEqual(list(iter_json_array(split(data, size))), items)
+
+    def test_iter_json_array_empty(self):
+        "Check that an empty array yields nothing"
+        self.assertEqual(list(iter_json_array([b" [ ", b" ] "])), [])
+
+    def test_iter_json_array_invalid(self):
+        "Check that bad or truncated input raises ValueError"
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"id": 1}']))
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"id": 1}, {"id"']))
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[1 2]']))
+
+    def test_map_concurrently(self):
+        "Check that results keep their order and caught errors are returned"
+        def invert(x):
+            return 1.0 / x
+
+        results = map_concurrently(invert, [1, 0, 4], 2, catch=(ZeroDivisionError,))
+
+        self.assertEqual(results[0], 1.0)
+        self.assertTrue(isinstance(results[1], ZeroDivisionError))
+        self.assertEqual(results[2], 0.25)
+
+        with self.assertRaises(ZeroDivisionError):
+            map_concurrently(invert, [0], 2)
@@ -0,0 +1,141 @@
+try:
+    # Try importing from unittest2 first. This is primarily for Py2.6 support.
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+import io
+import json
+import threading
+from mock import patch, Mock
+
+from liquidplanner import LiquidPlanner
+from liquidplanner.cache import ResponseCache
+from liquidplanner.webhooks import WebhookReceiver
+
+
+def create_receiver(**kwargs):
+    lp = LiquidPlanner(Mock(auth=None), workspace_id=1)
+    return WebhookReceiver(lp, token='secret', **kwargs)
+
+
+def create_environ(body, method='POST', query='token=secret', headers=None):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+
+    environ = {
+        'REQUEST_METHOD': method,
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    environ.update(headers or {})
+    return environ
+
+
+def call(receiver, environ):
+    start_response = Mock()
+    receiver(environ, start_response)
+    return start_response.call_args[0][0]
+
+
+class WebhookReceiverTest(unittest.TestCase):
+    def test_register(self):
+        "Check that the webhook is created with the token in its url"
+        receiver = create_receiver()
+        receiver.lp.webhooks.create = Mock(return_value={"id": 4})
+        receiver.lp.webhooks.delete = Mock()
+
+        receiver.register('https://example.com/hook?a=1', description='x')
+        receiver.lp.webhooks.create.assert_called_with({
+            'url': 'https://example.com/hook?a=1&token=secret',
+            'description': 'x'})
+
+        receiver.unregister()
+        receiver.lp.webhooks.delete.assert_called_with(4)
+        self.assertTrue(receiver.webhook is None)
+
+    def test_verify(self):
+        "Check that deliveries without the token are refused"
+        callback = Mock()
+        receiver = create_receiver(callbacks=[callback])
+        event = {"type": "Task", "id": 5, "change_type": "update"}
+
+        self.assertEqual(call(receiver, create_environ(event, query='')),
+                '403 Forbidden')
+        self.assertEqual(call(receiver, create_environ(event,
+                query='token=wrong')), '403 Forbidden')
+        self.assertFalse(callback.called)
+
+        self.assertEqual(call(receiver, create_environ(event, query='',
+                headers={'HTTP_X_WEBHOOK_TOKEN': 'secret'})), '204 No Content')
+        receiver.join()
+        callback.assert_called_with([event])
+
+    def test_bad_requests(self):
+        "Check that other methods and bodies are refused"
+        receiver = create_receiver()
+
+        self.assertEqual(call(receiver, create_environ({}, method='GET')),
+                '405 Method Not Allowed')
+        self.assertEqual(call(receiver, create_environ(b'not json')),
+                '400 Bad Request')
+        self.assertEqual(call(receiver, create_environ([1, 2])),
+                '400 Bad Request')
+
+    def test_cache(self):
+        "Check that cached responses for changed entities are dropped"
+        cache = ResponseCache()
+        cache.set('/workspaces/1/tasks/5', 'tasks', '{}')
+        cache.set('/workspaces/1/members/2', 'members', '{}')
+        receiver = create_receiver(cache=cache, background=False)
+
+        call(receiver, create_environ([{"type": "Task", "id": 5}]))
+        self.assertEqual(len(cache), 1)
+
+        # Unknown types drop everything in the workspace
+        call(receiver, create_environ({"type": "Unknown", "id": 1}))
+        self.assertEqual(len(cache), 0)
+
+    def test_mirror(self):
+        "Check that events are applied to the mirror"
+        mirror = Mock()
+        receiver = create_receiver(mirror=mirror)
+        events = [{"type": "TimesheetEntry", "id": 3, "change_type": "delete"}]
+
+        call(receiver, create_environ(events))
+        receiver.join()
+        mirror.apply.assert_called_with(events)
+
+    def test_background(self):
+        "Check that deliveries are acknowledged before they are handled"
+        applied = threading.Event()
+        release = threading.Event()
+
+        def apply(events):
+            release.wait(5)
+            applied.set()
+
+        receiver = create_receiver(mirror=Mock(apply=apply))
+
+        self.assertEqual(call(receiver, create_environ([{"type": "Task"}])),
+                '204 No Content')
+        self.assertFalse(applied.is_set())
+
+        release.set()
+        receiver.join()
+        self.assertTrue(applied.is_set())
+
+    @patch('liquidplanner.webhooks.logger')
+    def test_background_error(self, mock_logger):
+        "Check that a failed delivery is logged and doesn't stop the others"
+        callback = Mock(side_effect=[ValueError(), None])
+        receiver = create_receiver(callbacks=[callback])
+
+        call(receiver, create_environ([{"id": 1}]))
+        call(receiver, create_environ([{"id": 2}]))
+        receiver.join()
+
+        callback.assert_called_with([{"id": 2}])
+        self.assertEqual(mock_logger.exception.call_count, 1)